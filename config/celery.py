@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.signals import worker_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
@@ -13,5 +14,32 @@ app = Celery("config")
 #   should have a `CELERY_` prefix.
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
+# Sending emails waits on the SMTP server, so these tasks go to a dedicated
+# queue served by an eventlet worker (see the celery-email service in
+# docker-compose.yaml) instead of occupying prefork processes.
+EMAIL_QUEUE = "email"
+app.conf.task_routes = {
+    "modules.tasks.send_update_emails": {"queue": EMAIL_QUEUE},
+    "modules.tasks.send_digest_emails": {"queue": EMAIL_QUEUE},
+}
+
+
+@worker_init.connect
+def patch_psycopg_for_eventlet(sender=None, **kwargs):
+    """Make psycopg2 yield to other green threads in an eventlet worker."""
+
+    # -P eventlet arrives here as the pool name (or class) before it is loaded
+    if "eventlet" not in str(getattr(sender, "pool_cls", "")):
+        return
+    # Only the email worker needs eventlet and psycogreen, so they are not
+    # imported by the web server, management commands or prefork workers.
+    # The eventlet pool monkey patches the standard library, but psycopg2
+    # talks to the server from C code: without a wait callback every query
+    # would block all green threads of the worker.
+    from psycogreen.eventlet import patch_psycopg
+
+    patch_psycopg()
+
+
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
@@ -11,9 +11,11 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -146,12 +148,13 @@ AUTH_USER_MODEL = "users.User"
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
+        "users.filters.OwnerFilterBackend",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
@@ -161,8 +164,17 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.UserTokenObtainPairSerializer",
 }
 
+# Роли пользователя в claim "roles" токенов: проверка прав без запросов к базе.
+# Смена ролей меняет версию токенов, и пользователю нужно войти заново.
+USER_ROLES_IN_TOKEN = os.getenv("USER_ROLES_IN_TOKEN", "True") == "True"
+# Время жизни ролей пользователя в кэше, сек.
+USER_ROLES_TIMEOUT = 60 * 60
+# Время жизни состояния пользователя (активность, версия токенов) в кэше, сек.
+USER_AUTH_CACHE_TIMEOUT = 60 * 5
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Your Project API",
     "DESCRIPTION": "Your project description",
@@ -170,21 +182,99 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
 
+# Кэш: общий Redis для всех процессов приложения и воркеров Celery.
+# Генерации кэша каталога, окно уведомлений, роли и состояние токенов
+# сбрасываются в одном процессе и должны быть видны остальным, поэтому
+# кэш в локальной памяти процесса используется только в тестах.
+TESTING = sys.argv[1:2] == ["test"]
+CACHE_LOCATION = os.getenv("CACHE_LOCATION", "redis://localhost:6379/1")
+
+if TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+elif CACHE_LOCATION:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_LOCATION,
+        }
+    }
+else:
+    raise ImproperlyConfigured("Не задан CACHE_LOCATION - URL общего кэша Redis")
+
+# Время жизни закэшированных ответов каталога, сек.
+CATALOG_CACHE_TIMEOUT = 60 * 5
+# Время жизни последнего ответа, который отдается, пока другой воркер
+# пересчитывает актуальный, сек.
+CATALOG_STALE_TIMEOUT = 60 * 60
+# Время жизни блокировки пересчета и максимальное ожидание ее результата, сек.
+CATALOG_LOCK_TIMEOUT = 10
+CATALOG_LOCK_WAIT = 2
+
+# Максимальное количество объектов в одном запросе массового создания/изменения
+CATALOG_BULK_MAX_ITEMS = 500
+# Количество строк в одной команде COPY при импорте каталога из NDJSON
+# и в одной пачке серверного курсора при выгрузке
+CATALOG_IO_CHUNK_SIZE = 10000
+
+# Способ построения дерева модулей: "orm" - сериализаторы DRF,
+# "sql" - один запрос PostgreSQL с json_build_object/json_agg,
+# "snapshot" - готовые JSON-снимки модулей, перестраиваемые Celery при записи
+MODULES_TREE_RENDERER = os.getenv("MODULES_TREE_RENDERER", "orm")
+
 # Celery Configuration Options
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Количество получателей в одной задаче рассылки (одно SMTP-соединение)
+NOTIFICATION_CHUNK_SIZE = 500
+# Количество писем, после отправки которых пачка отмечается в журнале доставки
+NOTIFICATION_CHECKPOINT_SIZE = 50
+# Срок, на который письма закрепляются за пачкой отправки, сек. Больше лимита
+# времени задачи: начавшая работу пачка успевает отправить письма до истечения
+NOTIFICATION_CLAIM_TIMEOUT = CELERY_TASK_TIME_LIMIT * 2
+# Окно объединения уведомлений об изменениях одного модуля, сек.
+NOTIFICATION_DEBOUNCE = 60 * 10
+# Количество green threads воркера очереди email (пул eventlet): сколько
+# SMTP-соединений один воркер держит одновременно
+EMAIL_WORKER_CONCURRENCY = int(os.getenv("EMAIL_WORKER_CONCURRENCY", 50))
+# Количество событий outbox, публикуемых в брокер за одну транзакцию
+OUTBOX_BATCH_SIZE = 500
+# Режим уведомлений об изменениях модулей: "digest" - периодическая сводка
+# по всем измененным модулям подписчика, "immediate" - отдельное письмо
+# по каждому модулю через outbox и окно NOTIFICATION_DEBOUNCE
+NOTIFICATION_MODE = os.getenv("NOTIFICATION_MODE", "digest")
+# Период рассылки сводки, сек.
+NOTIFICATION_DIGEST_INTERVAL = 60 * 60
+# Срок хранения журнала изменений каталога, сек.: клиенты ленты /changes/
+# с более старым курсором получают ответ 410 и загружают каталог заново
+CATALOG_CHANGES_RETENTION = 60 * 60 * 24 * 30
+# Количество записей журнала изменений, удаляемых одним запросом
+CATALOG_CHANGES_PRUNE_BATCH = 5000
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL ")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 
 # Настройки для Celery
 CELERY_BEAT_SCHEDULE = {
-    'send email': {
-        'task': 'modules.tasks.send_updates',  # Путь к задаче
-        'schedule': timedelta(minutes=1),  # Расписание выполнения задачи (например, каждые 10 минут)
+    'relay outbox': {
+        'task': 'modules.tasks.relay_outbox',  # Публикация событий outbox в брокер
+        'schedule': timedelta(seconds=10),
+    },
+    'prune catalog changes': {
+        'task': 'modules.tasks.prune_catalog_changes',  # Очистка журнала изменений
+        'schedule': timedelta(days=1),
     },
 }
+if NOTIFICATION_MODE == "digest":
+    CELERY_BEAT_SCHEDULE['send digest'] = {
+        'task': 'modules.tasks.send_digest',  # Сводка изменений модулей подписчикам
+        'schedule': timedelta(seconds=NOTIFICATION_DIGEST_INTERVAL),
+    }
 
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = os.getenv("EMAIL_PORT")
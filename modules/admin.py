@@ -10,6 +10,7 @@ class ModuleAdmin(admin.ModelAdmin):
         "description",
     )
     search_fields = ("title",)
+    readonly_fields = ("courses_in_module_count", "subscribers_count")
 
 
 @admin.register(Course)
@@ -19,6 +20,7 @@ class CourseAdmin(admin.ModelAdmin):
         "description",
     )
     search_fields = ("title",)
+    readonly_fields = ("lessons_in_course_count", "subscribers_count")
 
 
 @admin.register(Lesson)
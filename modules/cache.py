@@ -0,0 +1,170 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = "catalog:generation:{}"
+MODIFIED_KEY = "catalog:modified:{}"
+STATS_KEY = "catalog:stats:{}"
+RESPONSE_KEY = "catalog:response:{}"
+STALE_KEY = "catalog:stale:{}"
+LOCK_KEY = "catalog:lock:{}"
+STATS = ("hits", "misses", "coalesced", "stale", "lock_timeouts")
+
+
+def _incr(key, delta=1, initial=None):
+    """Атомарно увеличивает значение ключа, создавая его при отсутствии."""
+
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta if initial is None else initial, timeout=None):
+            return cache.get(key)
+        return cache.incr(key, delta)
+
+
+def _initial_generation():
+    # Начальное значение берется из времени, чтобы после вытеснения ключа
+    # счетчик не совпал с одним из уже использованных поколений.
+    return time.time_ns() // 1000
+
+
+def get_generations(models):
+    """Возвращает текущие поколения данных для списка моделей."""
+
+    keys = [GENERATION_KEY.format(model._meta.label_lower) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(*models):
+    """
+    Увеличивает поколение данных моделей, делая недействительными
+    все закэшированные ответы, которые от них зависят.
+    """
+
+    def bump():
+        for model in models:
+            label = model._meta.label_lower
+            _incr(GENERATION_KEY.format(label), initial=_initial_generation())
+            cache.set(MODIFIED_KEY.format(label), time.time(), timeout=None)
+
+    bump()
+    # Повторное увеличение после фиксации транзакции не дает параллельному
+    # запросу закэшировать данные, прочитанные до коммита.
+    transaction.on_commit(bump)
+
+
+def _request_hash(request, scope):
+    query = sorted(request.query_params.lists())
+    raw = f"{request.path}|{query}|{scope}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def build_cache_key(request, models, scope=""):
+    """
+    Формирует ключ ответа по адресу, параметрам запроса, области видимости
+    (например, пользователю) и поколениям данных.
+    """
+
+    generations = ":".join(str(value) for value in get_generations(models))
+    return RESPONSE_KEY.format(f"{_request_hash(request, scope)}:{generations}")
+
+
+def build_etag(request, models, scope=""):
+    """Формирует ETag ответа: он меняется при любом изменении данных моделей."""
+
+    key = build_cache_key(request, models, scope)
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def get_last_modified(models):
+    """Возвращает время последнего изменения данных моделей (timestamp)."""
+
+    keys = [MODIFIED_KEY.format(model._meta.label_lower) for model in models]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # Время изменения неизвестно (ключ вытеснен или еще не создан):
+            # считаем данные измененными сейчас, чтобы не ответить 304 ошибочно.
+            cache.add(key, time.time(), timeout=None)
+            values[key] = cache.get(key)
+    return max(values.values())
+
+
+def build_stale_key(request, scope=""):
+    """Формирует ключ последнего вычисленного ответа без учета поколений данных."""
+
+    return STALE_KEY.format(_request_hash(request, scope))
+
+
+def record_stat(name):
+    """Увеличивает счетчик статистики кэша (hits, misses и т.д.)."""
+
+    _incr(STATS_KEY.format(name))
+
+
+def get_cache_stats(names=STATS):
+    """Возвращает значения счетчиков статистики кэша."""
+
+    values = cache.get_many([STATS_KEY.format(name) for name in names])
+    return {name: values.get(STATS_KEY.format(name), 0) for name in names}
+
+
+def get_cached_data(key):
+    """Возвращает закэшированные данные ответа и учитывает попадание или промах."""
+
+    data = cache.get(key)
+    record_stat("misses" if data is None else "hits")
+    return data
+
+
+def set_cached_data(key, data):
+    cache.set(key, data, timeout=settings.CATALOG_CACHE_TIMEOUT)
+
+
+def get_or_compute(key, stale_key, compute):
+    """
+    Возвращает данные из кэша, а при промахе вычисляет их в одном воркере.
+
+    Воркер, захвативший блокировку, вызывает compute() и сохраняет результат.
+    Остальные сразу получают устаревшее значение, если оно есть, либо ждут
+    результат до CATALOG_LOCK_WAIT секунд и только потом вычисляют сами.
+    Возвращает пару (данные, признак устаревшего значения).
+    """
+
+    data = get_cached_data(key)
+    if data is not None:
+        return data, False
+
+    lock_key = LOCK_KEY.format(key)
+    locked = cache.add(lock_key, 1, timeout=settings.CATALOG_LOCK_TIMEOUT)
+    if not locked:
+        stale = cache.get(stale_key)
+        if stale is not None:
+            record_stat("stale")
+            return stale, True
+
+        deadline = time.monotonic() + settings.CATALOG_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = cache.get(key)
+            if data is not None:
+                record_stat("coalesced")
+                return data, False
+        record_stat("lock_timeouts")
+
+    try:
+        data = compute()
+        set_cached_data(key, data)
+        cache.set(stale_key, data, timeout=settings.CATALOG_STALE_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return data, False
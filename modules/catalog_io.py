@@ -0,0 +1,344 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+from modules.cache import bump_generation
+from modules.models import (
+    CURRENT_TXID_SQL,
+    CatalogChange,
+    Course,
+    Lesson,
+    Module,
+    Subscription,
+)
+from modules.services import (
+    COURSE_COUNTERS,
+    MODULE_COUNTERS,
+    recount_courses,
+    recount_modules,
+)
+from users.models import User
+
+# Выгружаемые поля моделей каталога в порядке загрузки (родители раньше детей).
+# Внешние ключи на модели каталога выгружаются как <поле>_id и при загрузке
+# переназначаются на новые id, пользователи - как <поле>_email.
+CATALOG_MODELS = {
+    "module": (Module, ("title", "description", "price", "updated_at")),
+    "course": (Course, ("title", "preview", "description", "price", "updated_at")),
+    "lesson": (Lesson, ("title", "description", "preview", "video", "updated_at")),
+    "subscription": (Subscription, ("subscription_type", "via_module")),
+}
+# Счетчики не выгружаются: после загрузки они пересчитываются
+COUNTERS = {Module: MODULE_COUNTERS, Course: COURSE_COUNTERS}
+# Записи, ссылки которых не удалось переназначить, пропускаются
+IMPORT_FILTERS = {
+    "subscription": """
+        u_subscriber.id IS NOT NULL AND CASE COALESCE(s.subscription_type, 'module')
+            WHEN 'course' THEN p_course.new_id IS NOT NULL
+            ELSE p_module.new_id IS NOT NULL
+        END
+    """,
+}
+
+STAGING_TABLE = "catalog_import_{}"
+
+INSERT_SQL = """
+    INSERT INTO {table} ({columns})
+    SELECT {values}
+    FROM {staging} s {joins}
+    WHERE {where}
+    ORDER BY s.new_id
+    ON CONFLICT DO NOTHING
+"""
+
+RECORD_CHANGES_SQL = """
+    INSERT INTO {change} (model, object_id, action, changed_at, txid)
+    SELECT %s, new_id, 'created', now(), {txid} FROM {staging} ORDER BY new_id
+"""
+
+
+class CatalogJSONEncoder(DjangoJSONEncoder):
+    """Кодировщик выгрузки: даты сохраняются с микросекундами."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_references(model):
+    """
+    Возвращает внешние ключи модели: (поле, имя родителя в CATALOG_MODELS)
+    или (поле, None) для ссылок на пользователя.
+    """
+
+    references = []
+    for field in model._meta.concrete_fields:
+        if not field.is_relation:
+            continue
+        parent = field.related_model._meta.model_name
+        references.append((field, None if field.related_model is User else parent))
+    return references
+
+
+def get_columns(name):
+    """Возвращает колонки выгрузки модели каталога."""
+
+    model, fields = CATALOG_MODELS[name]
+    columns = ["id", *fields]
+    for field, parent in get_references(model):
+        columns.append(field.attname if parent else f"{field.name}_email")
+    return columns
+
+
+def get_export_queryset(name):
+    """Возвращает queryset строк выгрузки модели в порядке id."""
+
+    model, fields = CATALOG_MODELS[name]
+    references = get_references(model)
+    emails = {
+        f"{field.name}_email": F(f"{field.name}__email")
+        for field, parent in references
+        if parent is None
+    }
+    ids = [field.attname for field, parent in references if parent]
+    return model.objects.order_by("pk").values("id", *fields, *ids, **emails)
+
+
+def export_csv(name, file):
+    """
+    Выгружает модель в CSV с заголовком командой COPY ... TO STDOUT:
+    строки передаются потоком, не собираясь в памяти.
+    Возвращает количество строк.
+    """
+
+    sql, params = get_export_queryset(name).query.sql_with_params()
+    with connection.cursor() as cursor:
+        query = cursor.mogrify(sql, params).decode()
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", file)
+        return cursor.rowcount
+
+
+def export_ndjson(name, file):
+    """
+    Выгружает модель в NDJSON: по одному объекту {"model": ..., ...} на строку.
+    Строки читаются серверным курсором пачками по CATALOG_IO_CHUNK_SIZE.
+    Возвращает количество строк.
+    """
+
+    queryset = get_export_queryset(name)
+    count = 0
+    for row in queryset.iterator(chunk_size=settings.CATALOG_IO_CHUNK_SIZE):
+        file.write(json.dumps({"model": name, **row}, cls=CatalogJSONEncoder))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def _copy_value(value):
+    """Кодирует значение для текстового формата COPY."""
+
+    if value is None:
+        return r"\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _quote(names):
+    return ", ".join(connection.ops.quote_name(name) for name in names)
+
+
+def create_staging(cursor, name):
+    """
+    Создает временную таблицу загрузки модели с исходными id и ссылками.
+    Новые id выделяются из последовательности модели при вставке в нее.
+    """
+
+    model, fields = CATALOG_MODELS[name]
+    table = model._meta.db_table
+    types = ["bigint"]
+    types += [model._meta.get_field(field).db_type(connection) for field in fields]
+    types += ["bigint" if parent else "text" for _, parent in get_references(model)]
+    definitions = [
+        f"{connection.ops.quote_name(column)} {db_type}"
+        for column, db_type in zip(get_columns(name), types)
+    ]
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    (sequence,) = cursor.fetchone()
+    staging = STAGING_TABLE.format(name)
+    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE {staging} (
+            {", ".join(definitions)},
+            new_id bigint DEFAULT nextval(%s)
+        ) ON COMMIT DROP
+        """,
+        [sequence],
+    )
+
+
+def load_ndjson(cursor, file, chunk_size):
+    """
+    Загружает NDJSON во временные таблицы командами COPY пачками
+    по chunk_size строк на модель, поэтому память не зависит от размера файла.
+    """
+
+    columns = {name: get_columns(name) for name in CATALOG_MODELS}
+    buffers = {name: [] for name in CATALOG_MODELS}
+
+    def flush(name):
+        if not buffers[name]:
+            return
+        data = io.StringIO("\n".join(buffers[name]) + "\n")
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE.format(name)} ({_quote(columns[name])}) FROM STDIN",
+            data,
+        )
+        buffers[name].clear()
+
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            name = record.get("model")
+        except (ValueError, AttributeError):
+            raise ValueError(f"Строка {number}: ожидается объект JSON")
+        if name not in CATALOG_MODELS:
+            raise ValueError(f"Строка {number}: неизвестная модель {name!r}")
+        row = "\t".join(_copy_value(record.get(column)) for column in columns[name])
+        buffers[name].append(row)
+        if len(buffers[name]) >= chunk_size:
+            flush(name)
+    for name in CATALOG_MODELS:
+        flush(name)
+
+
+def load_csv(cursor, name, file):
+    """
+    Загружает CSV с заголовком во временную таблицу модели одной командой
+    COPY: файл передается в базу потоком.
+    """
+
+    header = next(csv.reader([file.readline()]), [])
+    unknown = set(header) - set(get_columns(name))
+    if unknown:
+        raise ValueError(f"{name}: неизвестные колонки {', '.join(sorted(unknown))}")
+    if not header:
+        return
+    cursor.copy_expert(
+        f"COPY {STAGING_TABLE.format(name)} ({_quote(header)}) "
+        "FROM STDIN WITH (FORMAT csv)",
+        file,
+    )
+
+
+def _get_insert_sql(name):
+    model, fields = CATALOG_MODELS[name]
+    columns = ["id"]
+    values = ["s.new_id"]
+    params = []
+    for field_name in fields:
+        field = model._meta.get_field(field_name)
+        column = f"s.{connection.ops.quote_name(field_name)}"
+        columns.append(field.column)
+        if getattr(field, "auto_now", False):
+            values.append(f"COALESCE({column}, now())")
+        elif field.has_default():
+            values.append(f"COALESCE({column}, %s)")
+            params.append(field.to_python(field.get_default()))
+        else:
+            values.append(column)
+    for counter in COUNTERS.get(model, ()):
+        columns.append(model._meta.get_field(counter).column)
+        values.append("0")
+    joins = []
+    for field, parent in get_references(model):
+        columns.append(field.column)
+        if parent:
+            alias = f"p_{field.name}"
+            joins.append(
+                f"LEFT JOIN {STAGING_TABLE.format(parent)} {alias} "
+                f"ON {alias}.id = s.{field.attname}"
+            )
+            values.append(f"{alias}.new_id")
+        else:
+            alias = f"u_{field.name}"
+            joins.append(
+                f"LEFT JOIN {User._meta.db_table} {alias} "
+                f"ON {alias}.email = s.{field.name}_email"
+            )
+            values.append(f"{alias}.id")
+    sql = INSERT_SQL.format(
+        table=model._meta.db_table,
+        columns=_quote(columns),
+        values=", ".join(values),
+        staging=STAGING_TABLE.format(name),
+        joins=" ".join(joins),
+        where=IMPORT_FILTERS.get(name, "TRUE"),
+    )
+    return sql, params
+
+
+def import_catalog(load):
+    """
+    Импортирует каталог в одной транзакции.
+
+    load(cursor) заполняет временные таблицы командами COPY, затем записи
+    вставляются в таблицы моделей одним INSERT ... SELECT на модель:
+    новые id выделяются из последовательностей, ссылки на модули и курсы
+    переназначаются соединением с временными таблицами родителей,
+    пользователи находятся по email. Счетчики пересчитываются, создание
+    модулей, курсов и уроков записывается в журнал изменений.
+    Возвращает {модель: (загружено строк, добавлено записей)}.
+    """
+
+    tracked = {choice for choice, _ in CatalogChange.MODEL_CHOICES}
+    stats = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name in CATALOG_MODELS:
+            create_staging(cursor, name)
+        load(cursor)
+        for name in CATALOG_MODELS:
+            staging = STAGING_TABLE.format(name)
+            cursor.execute(f"SELECT count(*), count(DISTINCT id) FROM {staging}")
+            total, distinct = cursor.fetchone()
+            cursor.execute(f"SELECT count(*) FROM {staging} WHERE id IS NOT NULL")
+            if cursor.fetchone()[0] != distinct:
+                raise ValueError(f"{name}: повторяющиеся значения id")
+            cursor.execute(f"CREATE INDEX ON {staging} (id)")
+            cursor.execute(f"ANALYZE {staging}")
+            sql, params = _get_insert_sql(name)
+            cursor.execute(sql, params)
+            stats[name] = (total, cursor.rowcount)
+            if name in tracked and total:
+                cursor.execute(
+                    RECORD_CHANGES_SQL.format(
+                        change=CatalogChange._meta.db_table,
+                        staging=staging,
+                        txid=CURRENT_TXID_SQL,
+                    ),
+                    [name],
+                )
+
+        for model, recount in ((Module, recount_modules), (Course, recount_courses)):
+            staging = STAGING_TABLE.format(model._meta.model_name)
+            imported = RawSQL(f"SELECT new_id FROM {staging}", [])
+            recount(model.objects.filter(pk__in=imported))
+        for name in CATALOG_MODELS:
+            cursor.execute(f"DROP TABLE {STAGING_TABLE.format(name)}")
+        bump_generation(*(model for model, _ in CATALOG_MODELS.values()))
+    return stats
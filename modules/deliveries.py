@@ -0,0 +1,158 @@
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from modules.models import Delivery, Notification, Subscription
+from modules.notifications import iter_chunks, send_messages
+
+# Журнал доставки заполняется одним INSERT ... SELECT по подписчикам модуля.
+# Повторный запуск не создает дубликатов благодаря unique_delivery.
+CREATE_DELIVERIES_SQL = """
+    INSERT INTO {delivery} (notification_id, subscriber_id, status)
+    SELECT DISTINCT %(notification_id)s, s.subscriber_id, 'pending'
+    FROM {subscription} s
+    WHERE s.module_id = %(module_id)s AND s.subscriber_id IS NOT NULL
+    ON CONFLICT (notification_id, subscriber_id) DO NOTHING
+"""
+
+
+def create_deliveries(notification):
+    """
+    Записывает в журнал доставки всех подписчиков модуля рассылки.
+    Возвращает количество добавленных получателей.
+    """
+
+    sql = CREATE_DELIVERIES_SQL.format(
+        delivery=Delivery._meta.db_table,
+        subscription=Subscription._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {"notification_id": notification.pk, "module_id": notification.module_id},
+        )
+        return cursor.rowcount
+
+
+def get_unclaimed(notification_id):
+    """
+    Возвращает неотправленные письма рассылки, не закрепленные за пачкой
+    отправки или закрепленные дольше NOTIFICATION_CLAIM_TIMEOUT секунд назад.
+    """
+
+    expired = timezone.now() - timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT)
+    return Delivery.objects.filter(
+        Q(claim__isnull=True) | Q(claimed_at__lt=expired),
+        notification_id=notification_id,
+        status="pending",
+    )
+
+
+def iter_pending(notification_id):
+    """
+    Возвращает поток id подписчиков, которым письмо еще не отправлено
+    и не закреплено за другой пачкой отправки.
+    """
+
+    return (
+        get_unclaimed(notification_id)
+        .order_by("subscriber_id")
+        .values_list("subscriber_id", flat=True)
+        .iterator(chunk_size=settings.NOTIFICATION_CHUNK_SIZE)
+    )
+
+
+def claim_deliveries(notification_id, subscriber_ids):
+    """
+    Закрепляет неотправленные письма получателей за новой пачкой отправки
+    одним UPDATE. Письма, которые успела закрепить другая пачка, пропускаются.
+    Возвращает (id пачки, количество закрепленных писем).
+    """
+
+    claim = uuid4()
+    count = (
+        get_unclaimed(notification_id)
+        .filter(subscriber_id__in=subscriber_ids)
+        .update(claim=claim, claimed_at=timezone.now())
+    )
+    return claim, count
+
+
+def release_claim(claim):
+    """Возвращает неотправленные письма пачки в очередь resume_notification."""
+
+    return Delivery.objects.filter(claim=claim, status="pending").update(
+        claim=None, claimed_at=None
+    )
+
+
+def mark_sent(notification_id, subscriber_ids):
+    """Отмечает письма пачки получателей отправленными одним UPDATE."""
+
+    return Delivery.objects.filter(
+        notification_id=notification_id,
+        subscriber_id__in=subscriber_ids,
+        status="pending",
+    ).update(status="sent", sent_at=timezone.now())
+
+
+def deliver(notification_id, claim, smtp=None):
+    """
+    Отправляет письма пачки claim через одно SMTP-соединение smtp
+    (по умолчанию - соединение бэкенда из настроек).
+
+    В начале аренда писем пачки продлевается: если resume_notification уже
+    закрепила их за новой пачкой, отправлять нечего. Уже отправленные письма
+    пропускаются, а отправленные отмечаются в журнале после каждых
+    NOTIFICATION_CHECKPOINT_SIZE писем, поэтому повтор после сбоя воркера
+    отправляет заново не больше одной такой порции.
+    Возвращает количество отправленных писем.
+    """
+
+    pending = Delivery.objects.filter(
+        notification_id=notification_id, claim=claim, status="pending"
+    )
+    if not pending.update(claimed_at=timezone.now()):
+        return 0
+    notification = (
+        Notification.objects.filter(pk=notification_id)
+        .only("subject", "message")
+        .first()
+    )
+    if notification is None:
+        return 0
+    recipients = pending.order_by("subscriber_id").values_list(
+        "subscriber_id", "subscriber__email"
+    )
+    sent = 0
+    with smtp or get_connection() as smtp:
+        for batch in iter_chunks(recipients, settings.NOTIFICATION_CHECKPOINT_SIZE):
+            send_messages(
+                notification.subject,
+                notification.message,
+                [email for _, email in batch],
+                connection=smtp,
+            )
+            mark_sent(notification_id, [pk for pk, _ in batch])
+            sent += len(batch)
+    return sent
+
+
+def get_progress(notification_ids=None):
+    """
+    Возвращает рассылки с количеством получателей (total) и отправленных
+    писем (sent) - запрос прогресса для операторов.
+    """
+
+    queryset = Notification.objects.annotate(
+        total=Count("deliveries"),
+        sent=Count("deliveries", filter=Q(deliveries__status="sent")),
+    ).order_by("-pk")
+    if notification_ids is not None:
+        queryset = queryset.filter(pk__in=notification_ids)
+    return queryset
@@ -0,0 +1,16 @@
+import eventlet
+from django.core.mail.backends.smtp import EmailBackend
+
+# smtplib с зелеными socket/ssl: не требует monkey patching всего процесса
+green_smtplib = eventlet.import_patched("smtplib")
+
+
+class GreenSMTPEmailBackend(EmailBackend):
+    """
+    SMTP-бэкенд на зеленых сокетах eventlet. Пока одно соединение ждет
+    ответа сервера, выполняются другие green threads процесса.
+    """
+
+    @property
+    def connection_class(self):
+        return green_smtplib.SMTP_SSL if self.use_ssl else green_smtplib.SMTP
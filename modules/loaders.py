@@ -0,0 +1,70 @@
+from django.db.models import Q
+
+from modules.models import Subscription
+
+
+class SubscriptionLoader:
+    """
+    Загрузчик подписок пользователя в рамках одного запроса.
+
+    Сериализаторы заранее сообщают (prime) id модулей и курсов, которые
+    будут выведены, и при первой проверке все они разрешаются одним
+    запросом. Для анонимного пользователя запросы не выполняются.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.pending = set()
+        self.loaded = set()
+        self.subscribed = set()
+
+    @property
+    def is_active(self):
+        return self.user is not None and self.user.is_authenticated
+
+    def prime(self, subscription_type, pks):
+        """Добавляет объекты в очередь на проверку подписки."""
+
+        if self.is_active:
+            self.pending |= {(subscription_type, pk) for pk in pks} - self.loaded
+
+    def load(self):
+        """Проверяет подписки на все объекты из очереди одним запросом."""
+
+        if not self.pending:
+            return
+        ids = {"module": set(), "course": set()}
+        for subscription_type, pk in self.pending:
+            ids[subscription_type].add(pk)
+        rows = Subscription.objects.filter(
+            Q(module_id__in=ids["module"]) | Q(course_id__in=ids["course"]),
+            subscriber=self.user,
+        ).values_list("module_id", "course_id")
+        for module_id, course_id in rows:
+            self.subscribed.add(("module", module_id))
+            self.subscribed.add(("course", course_id))
+        self.loaded |= self.pending
+        self.pending = set()
+
+    def is_subscribed(self, subscription_type, pk):
+        """Возвращает признак подписки пользователя на модуль или курс."""
+
+        if not self.is_active:
+            return False
+        key = (subscription_type, pk)
+        if key not in self.loaded:
+            self.pending.add(key)
+            self.load()
+        return key in self.subscribed
+
+
+def get_subscription_loader(request):
+    """Возвращает загрузчик подписок, общий для всего запроса."""
+
+    if request is None:
+        return SubscriptionLoader(None)
+    loader = getattr(request, "subscription_loader", None)
+    if loader is None:
+        loader = SubscriptionLoader(getattr(request, "user", None))
+        request.subscription_loader = loader
+    return loader
@@ -0,0 +1,122 @@
+import time
+
+import eventlet
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from modules.deliveries import (
+    claim_deliveries,
+    create_deliveries,
+    deliver,
+    iter_pending,
+)
+from modules.models import Module, Notification, Subscription
+from modules.notifications import iter_chunks, send_messages
+from modules.smtp_sink import SMTPSink
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет пропускную способность рассылки (писем в секунду) "
+        "на локальном SMTP-сервере-заглушке. Письма отправляются через журнал "
+        "доставки (deliver); данные замера откатываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=1000)
+        parser.add_argument(
+            "--chunk-size", type=int, default=settings.NOTIFICATION_CHUNK_SIZE
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=settings.EMAIL_WORKER_CONCURRENCY
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0,
+            help="Задержка ответа SMTP-заглушки на письмо, сек.",
+        )
+
+    def get_connection(
+        self, sink, backend="django.core.mail.backends.smtp.EmailBackend"
+    ):
+        return get_connection(
+            backend,
+            host=sink.host,
+            port=sink.port,
+            username="",
+            password="",
+            use_ssl=False,
+            use_tls=False,
+        )
+
+    def send_per_message(self, sink, recipients):
+        # Прежний способ: новое SMTP-соединение на каждое письмо
+        for email in recipients:
+            send_messages("Тест", "Тест", [email], self.get_connection(sink))
+
+    def claim_chunks(self, module, chunk_size):
+        # Как send_updates и resume_notification, но без брокера:
+        # рассылка, журнал доставки и пачки, закрепленные за задачами
+        notification = Notification.objects.create(
+            module=module, subject="Тест", message="Тест"
+        )
+        create_deliveries(notification)
+        chunks = list(iter_chunks(iter_pending(notification.pk), chunk_size))
+        return notification.pk, [
+            claim_deliveries(notification.pk, chunk)[0] for chunk in chunks
+        ]
+
+    def send_chunked(self, sink, module, chunk_size):
+        notification_id, claims = self.claim_chunks(module, chunk_size)
+        for claim in claims:
+            deliver(notification_id, claim, self.get_connection(sink))
+
+    def send_green(self, sink, module, chunk_size, concurrency):
+        # Воркер очереди email с пулом eventlet: пачки отправляются
+        # параллельно в green threads, не больше concurrency одновременно.
+        # Без psycogreen запросы к базе здесь не переключают green threads,
+        # поэтому замер дает нижнюю оценку пропускной способности воркера
+        notification_id, claims = self.claim_chunks(module, chunk_size)
+        pool = eventlet.GreenPool(concurrency)
+        for claim in claims:
+            connection = self.get_connection(
+                sink, "modules.email_backends.GreenSMTPEmailBackend"
+            )
+            pool.spawn_n(deliver, notification_id, claim, connection)
+        pool.waitall()
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        module = Module.objects.create(title="benchmark_emails", description="-")
+        users = User.objects.bulk_create(
+            User(email=f"benchmark{i}@example.com") for i in range(options["count"])
+        )
+        Subscription.objects.bulk_create(
+            Subscription(subscriber=user, module=module) for user in users
+        )
+        recipients = [user.email for user in users]
+        modes = {
+            "per-message": lambda sink: self.send_per_message(sink, recipients),
+            "chunked": lambda sink: self.send_chunked(
+                sink, module, options["chunk_size"]
+            ),
+            f"green x{options['concurrency']}": lambda sink: self.send_green(
+                sink, module, options["chunk_size"], options["concurrency"]
+            ),
+        }
+        for name, send in modes.items():
+            with SMTPSink(latency=options["latency"]) as sink:
+                started = time.perf_counter()
+                send(sink)
+                elapsed = time.perf_counter() - started
+                received = sink.received
+            self.stdout.write(
+                f"{name}: {received} писем за {elapsed:.2f} с, "
+                f"{received / elapsed:.0f} писем/с"
+            )
+        # Пользователи, подписки и журнал доставки замера не сохраняются
+        transaction.set_rollback(True)
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from modules.cache import get_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Выводит статистику попаданий и промахов кэша ответов каталога"
+
+    def handle(self, *args, **options):
+        for name, value in get_cache_stats().items():
+            self.stdout.write(f"{name}: {value}")
@@ -0,0 +1,65 @@
+import sys
+import time
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from modules.catalog_io import CATALOG_MODELS, export_csv, export_ndjson
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает модули, курсы, уроки и подписки в NDJSON (один файл, "
+        "'-' - стандартный вывод) или CSV (каталог с файлом на каждую модель)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+        parser.add_argument(
+            "--model", nargs="+", choices=list(CATALOG_MODELS), dest="models"
+        )
+
+    def export(self, path, file_format, names):
+        if file_format == "csv":
+            directory = Path(path)
+            directory.mkdir(parents=True, exist_ok=True)
+            for name in names:
+                with open(directory / f"{name}.csv", "w", encoding="utf-8") as file:
+                    yield name, export_csv(name, file)
+        elif path == "-":
+            for name in names:
+                yield name, export_ndjson(name, sys.stdout)
+        else:
+            with open(path, "w", encoding="utf-8") as file:
+                for name in names:
+                    yield name, export_ndjson(name, file)
+
+    def handle(self, *args, **options):
+        path, file_format = options["path"], options["format"]
+        if path == "-" and file_format == "csv":
+            raise CommandError("Выгрузка в CSV выполняется в каталог")
+        models = options["models"] or CATALOG_MODELS
+        names = [name for name in CATALOG_MODELS if name in models]
+        # Отчет не смешивается с данными, выгружаемыми в стандартный вывод
+        report = self.stderr if path == "-" else self.stdout
+
+        started = time.perf_counter()
+        total = 0
+        in_transaction = connection.in_atomic_block
+        with transaction.atomic():
+            if not in_transaction:
+                # Все модели выгружаются из одного снимка базы
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"
+                    )
+            for name, count in self.export(path, file_format, names):
+                total += count
+                report.write(f"{name}: {count} строк")
+        elapsed = time.perf_counter() - started
+        report.write(
+            f"Выгружено {total} строк за {elapsed:.2f} с, "
+            f"{total / elapsed:.0f} строк/с"
+        )
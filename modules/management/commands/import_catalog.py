@@ -0,0 +1,72 @@
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from modules.catalog_io import CATALOG_MODELS, import_catalog, load_csv, load_ndjson
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает модули, курсы, уроки и подписки из NDJSON (файл, '-' - "
+        "стандартный ввод) или CSV (каталог с файлами <модель>.csv) "
+        "командами COPY с переназначением id"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["ndjson", "csv"], default=None)
+        parser.add_argument(
+            "--chunk-size", type=int, default=settings.CATALOG_IO_CHUNK_SIZE
+        )
+
+    def load_csv(self, cursor, directory):
+        for name in CATALOG_MODELS:
+            path = directory / f"{name}.csv"
+            if path.exists():
+                with open(path, newline="", encoding="utf-8") as file:
+                    load_csv(cursor, name, file)
+
+    def load_ndjson(self, cursor, path, chunk_size):
+        if path == "-":
+            load_ndjson(cursor, sys.stdin, chunk_size)
+            return
+        with open(path, encoding="utf-8") as file:
+            load_ndjson(cursor, file, chunk_size)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"]
+        if file_format is None:
+            file_format = "csv" if Path(path).is_dir() else "ndjson"
+        if file_format == "csv":
+            directory = Path(path)
+            if not directory.is_dir():
+                raise CommandError(f"Каталог {path} не найден")
+            load = partial(self.load_csv, directory=directory)
+        else:
+            load = partial(
+                self.load_ndjson, path=path, chunk_size=options["chunk_size"]
+            )
+
+        started = time.perf_counter()
+        try:
+            stats = import_catalog(load)
+        except (OSError, ValueError, DatabaseError) as error:
+            raise CommandError(f"Импорт отменен: {error}")
+        elapsed = time.perf_counter() - started
+
+        for name, (loaded, imported) in stats.items():
+            self.stdout.write(
+                f"{name}: загружено {loaded}, добавлено {imported}, "
+                f"пропущено {loaded - imported}"
+            )
+        total = sum(imported for _, imported in stats.values())
+        self.stdout.write(
+            f"Импортировано {total} строк за {elapsed:.2f} с, "
+            f"{total / elapsed:.0f} строк/с"
+        )
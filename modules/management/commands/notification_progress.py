@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand
+
+from modules.deliveries import get_progress
+from modules.tasks import resume_notification
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает прогресс рассылок по журналу доставки и при необходимости "
+        "возобновляет отправку оставшимся получателям"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("notification_ids", nargs="*", type=int)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Поставить в очередь неотправленные письма указанных рассылок",
+        )
+
+    def handle(self, *args, **options):
+        notification_ids = options["notification_ids"] or None
+        for notification in get_progress(notification_ids)[: options["limit"]]:
+            self.stdout.write(
+                f"#{notification.pk} {notification.subject}: "
+                f"отправлено {notification.sent} из {notification.total}"
+            )
+            if options["resume"] and notification_ids:
+                queued = resume_notification(notification.pk)
+                self.stdout.write(f"  поставлено в очередь: {queued}")
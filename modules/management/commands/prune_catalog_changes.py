@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from modules.tasks import prune_catalog_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из журнала изменений каталога записи старше "
+        "CATALOG_CHANGES_RETENTION, уже учтенные в сводке"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        deleted = prune_catalog_changes(options["batch_size"])
+        self.stdout.write(f"Удалено записей журнала: {deleted}")
@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from modules.models import Module
+from modules.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = "Перестраивает JSON-снимки всех модулей"
+
+    def handle(self, *args, **options):
+        module_ids = list(Module.objects.values_list("pk", flat=True))
+        built = build_snapshots(module_ids)
+        self.stdout.write(f"Построено снимков модулей: {len(built)}")
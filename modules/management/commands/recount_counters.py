@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from modules.cache import bump_generation
+from modules.models import Course, Module
+from modules.services import recount_courses, recount_modules
+
+
+class Command(BaseCommand):
+    help = "Сверяет и исправляет денормализованные счетчики модулей и курсов"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            modules_fixed = recount_modules()
+            courses_fixed = recount_courses()
+            if modules_fixed or courses_fixed:
+                bump_generation(Module, Course)
+
+        self.stdout.write(
+            f"Исправлено счетчиков: модули - {modules_fixed}, курсы - {courses_fixed}"
+        )
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from modules.tasks import relay_outbox
+
+
+class Command(BaseCommand):
+    help = "Публикует накопленные события outbox в брокер Celery"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        published = relay_outbox(options["batch_size"])
+        self.stdout.write(f"Опубликовано событий: {published}")
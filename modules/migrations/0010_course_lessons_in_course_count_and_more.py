@@ -0,0 +1,74 @@
+# Generated by Django 4.2.9 on 2026-10-18 05:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняет счетчики по существующим данным."""
+
+    Module = apps.get_model("modules", "Module")
+    Course = apps.get_model("modules", "Course")
+    Lesson = apps.get_model("modules", "Lesson")
+    Subscription = apps.get_model("modules", "Subscription")
+
+    def count(model, field):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(**{field: OuterRef("pk")})
+                .order_by()
+                .values(field)
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            0,
+        )
+
+    Module.objects.update(
+        courses_in_module_count=count(Course, "module"),
+        subscribers_count=count(Subscription, "module"),
+    )
+    Course.objects.update(
+        lessons_in_course_count=count(Lesson, "course"),
+        subscribers_count=count(Subscription, "course"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0009_alter_course_module_alter_lesson_course"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="lessons_in_course_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество уроков"
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="subscribers_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество подписчиков"
+            ),
+        ),
+        migrations.AddField(
+            model_name="module",
+            name="courses_in_module_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество курсов"
+            ),
+        ),
+        migrations.AddField(
+            model_name="module",
+            name="subscribers_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество подписчиков"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.9 on 2026-10-18 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0010_course_lessons_in_course_count_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+        ),
+        migrations.AddField(
+            model_name="module",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.9 on 2026-10-18 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0011_course_updated_at_lesson_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "model",
+                    models.CharField(
+                        choices=[
+                            ("module", "Модуль"),
+                            ("course", "Курс"),
+                            ("lesson", "Урок"),
+                        ],
+                        max_length=10,
+                        verbose_name="Модель",
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.PositiveBigIntegerField(verbose_name="ID объекта"),
+                ),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "Создание"),
+                            ("updated", "Изменение"),
+                            ("deleted", "Удаление"),
+                        ],
+                        max_length=10,
+                        verbose_name="Действие",
+                    ),
+                ),
+                (
+                    "changed_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата изменения"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Изменение каталога",
+                "verbose_name_plural": "Изменения каталога",
+                "ordering": ("pk",),
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.9 on 2026-10-18 05:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0012_catalogchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ModuleSnapshot",
+            fields=[
+                (
+                    "module",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="snapshot",
+                        serialize=False,
+                        to="modules.module",
+                        verbose_name="Модуль",
+                    ),
+                ),
+                ("data", models.TextField(verbose_name="JSON-документ")),
+                (
+                    "built_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата построения"),
+                ),
+            ],
+            options={
+                "verbose_name": "Снимок модуля",
+                "verbose_name_plural": "Снимки модулей",
+            },
+        ),
+    ]
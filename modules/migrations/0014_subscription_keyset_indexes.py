@@ -0,0 +1,25 @@
+# Generated by Django 4.2.9 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0013_modulesnapshot"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscription",
+            index=models.Index(
+                fields=["module", "id"], name="subscription_module_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="subscription",
+            index=models.Index(
+                fields=["course", "id"], name="subscription_course_id_idx"
+            ),
+        ),
+    ]
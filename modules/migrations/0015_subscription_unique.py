@@ -0,0 +1,68 @@
+# Generated by Django 4.2.9 on 2026-10-18 05:47
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Удаляет повторные подписки пользователя на один модуль или курс,
+    оставляя самую раннюю, и пересчитывает счетчики подписчиков.
+    """
+
+    Module = apps.get_model("modules", "Module")
+    Course = apps.get_model("modules", "Course")
+    Subscription = apps.get_model("modules", "Subscription")
+
+    for field in ("module", "course"):
+        duplicates = (
+            Subscription.objects.filter(
+                subscriber__isnull=False, **{f"{field}__isnull": False}
+            )
+            .values("subscriber", field)
+            .annotate(first_id=Min("id"), total=Count("id"))
+            .filter(total__gt=1)
+        )
+        for row in duplicates:
+            Subscription.objects.filter(
+                subscriber=row["subscriber"], **{field: row[field]}
+            ).exclude(id=row["first_id"]).delete()
+
+    def count(field):
+        return Coalesce(
+            Subquery(
+                Subscription.objects.filter(**{field: OuterRef("pk")})
+                .order_by()
+                .values(field)
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            0,
+        )
+
+    Module.objects.update(subscribers_count=count("module"))
+    Course.objects.update(subscribers_count=count("course"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0014_subscription_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="subscription",
+            constraint=models.UniqueConstraint(
+                fields=("subscriber", "module"), name="unique_module_subscription"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="subscription",
+            constraint=models.UniqueConstraint(
+                fields=("subscriber", "course"), name="unique_course_subscription"
+            ),
+        ),
+    ]
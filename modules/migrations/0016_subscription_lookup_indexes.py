@@ -0,0 +1,61 @@
+# Generated by Django 4.2.9 on 2026-10-18 05:48
+
+from django.db import migrations, models
+
+
+def fix_subscription_types(apps, schema_editor):
+    """
+    Приводит тип подписки в соответствие с заполненной ссылкой.
+    Подписки без модуля и курса ни на что не указывают и удаляются.
+    """
+
+    Subscription = apps.get_model("modules", "Subscription")
+    Subscription.objects.filter(
+        subscription_type="module", module__isnull=True, course__isnull=False
+    ).update(subscription_type="course")
+    Subscription.objects.filter(
+        subscription_type="course", course__isnull=True, module__isnull=False
+    ).update(subscription_type="module")
+    Subscription.objects.filter(module__isnull=True, course__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0015_subscription_unique"),
+    ]
+
+    operations = [
+        migrations.RunPython(fix_subscription_types, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="subscription",
+            index=models.Index(
+                condition=models.Q(("module__isnull", False)),
+                fields=["module", "subscriber"],
+                name="subscription_module_user_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="subscription",
+            index=models.Index(
+                condition=models.Q(("course__isnull", False)),
+                fields=["course", "subscriber"],
+                name="subscription_course_user_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="subscription",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("module__isnull", False), ("subscription_type", "module")
+                    ),
+                    models.Q(
+                        ("course__isnull", False), ("subscription_type", "course")
+                    ),
+                    _connector="OR",
+                ),
+                name="subscription_type_matches_target",
+            ),
+        ),
+    ]
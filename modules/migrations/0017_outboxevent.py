@@ -0,0 +1,47 @@
+# Generated by Django 4.2.9 on 2026-10-18 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0016_subscription_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event_type",
+                    models.CharField(
+                        choices=[("module_updated", "Модуль изменен")],
+                        max_length=50,
+                        verbose_name="Тип события",
+                    ),
+                ),
+                ("payload", models.JSONField(default=dict, verbose_name="Данные")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие outbox",
+                "verbose_name_plural": "События outbox",
+                "ordering": ("pk",),
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.9 on 2026-10-18 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0017_outboxevent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationCursor",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=50,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Название",
+                    ),
+                ),
+                (
+                    "position",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Последнее изменение"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+                ),
+            ],
+            options={
+                "verbose_name": "Позиция рассылки",
+                "verbose_name_plural": "Позиции рассылок",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="catalogchange",
+            index=models.Index(
+                fields=["model", "id"], name="catalog_change_model_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-18 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0019_delivery_ledger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(fields=["owner", "id"], name="course_owner_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(fields=["owner", "id"], name="lesson_owner_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="module",
+            index=models.Index(fields=["owner", "id"], name="module_owner_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="subscription",
+            index=models.Index(
+                fields=["subscriber", "id"], name="subscription_subscriber_id_idx"
+            ),
+        ),
+    ]
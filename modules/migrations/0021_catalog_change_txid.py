@@ -0,0 +1,48 @@
+# Generated by Django 4.2.9 on 2026-10-18 06:26
+
+from django.db import migrations, models
+import modules.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0020_owner_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="catalogchange",
+            name="catalog_change_model_id_idx",
+        ),
+        # Существующие изменения давно зафиксированы: им достаточно txid = 0
+        migrations.AddField(
+            model_name="catalogchange",
+            name="txid",
+            field=models.PositiveBigIntegerField(
+                default=0, editable=False, verbose_name="Транзакция"
+            ),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name="catalogchange",
+            name="txid",
+            field=models.PositiveBigIntegerField(
+                default=modules.models.current_transaction_id,
+                editable=False,
+                verbose_name="Транзакция",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogchange",
+            index=models.Index(
+                fields=["txid", "id"], name="catalog_change_txid_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogchange",
+            index=models.Index(
+                fields=["model", "txid", "id"], name="catalog_change_model_txid_idx"
+            ),
+        ),
+    ]
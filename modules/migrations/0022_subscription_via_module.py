@@ -0,0 +1,43 @@
+# Generated by Django 4.2.9 on 2026-10-18 06:30
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def mark_module_course_subscriptions(apps, schema_editor):
+    """
+    Отмечает подписки на курсы модулей, на которые подписан тот же
+    пользователь: до появления признака они добавлялись подпиской на модуль
+    и удалялись вместе с ней.
+    """
+
+    Subscription = apps.get_model("modules", "Subscription")
+    Subscription.objects.filter(
+        Exists(
+            Subscription.objects.filter(
+                subscriber=OuterRef("subscriber"),
+                module=OuterRef("course__module"),
+            )
+        ),
+        course__isnull=False,
+    ).update(via_module=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0021_catalog_change_txid"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscription",
+            name="via_module",
+            field=models.BooleanField(
+                default=False, verbose_name="Добавлена подпиской на модуль"
+            ),
+        ),
+        migrations.RunPython(
+            mark_module_course_subscriptions, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.9 on 2026-10-18 06:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("modules", "0022_subscription_via_module"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="subscription",
+            name="subscription_module_user_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="subscription",
+            name="subscription_course_user_idx",
+        ),
+        migrations.AlterField(
+            model_name="subscription",
+            name="course",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="course_for_subscription",
+                to="modules.course",
+                verbose_name="Курс",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="subscription",
+            name="module",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="module_for_subscription",
+                to="modules.module",
+                verbose_name="Модуль",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="subscription",
+            name="subscriber",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Подписчик",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-18 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0023_subscription_redundant_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="delivery",
+            name="claim",
+            field=models.UUIDField(
+                blank=True, null=True, verbose_name="Пачка отправки"
+            ),
+        ),
+        migrations.AddField(
+            model_name="delivery",
+            name="claimed_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Дата закрепления"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="delivery",
+            index=models.Index(fields=["claim"], name="delivery_claim_idx"),
+        ),
+    ]
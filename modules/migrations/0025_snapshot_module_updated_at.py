@@ -0,0 +1,32 @@
+# Generated by Django 4.2.9 on 2026-10-18 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("modules", "0024_delivery_claim"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="modulesnapshot",
+            name="module_updated_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Дата изменения модуля"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="outboxevent",
+            name="event_type",
+            field=models.CharField(
+                choices=[
+                    ("module_updated", "Модуль изменен"),
+                    ("snapshots_rebuild", "Перестроение снимков модулей"),
+                ],
+                max_length=50,
+                verbose_name="Тип события",
+            ),
+        ),
+    ]
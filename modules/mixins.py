@@ -0,0 +1,180 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from modules import snapshots, sql
+from modules.cache import (
+    build_cache_key,
+    build_etag,
+    build_stale_key,
+    get_last_modified,
+    get_or_compute,
+)
+from modules.models import Module
+from modules.renderers import RawJSON
+from modules.serializers import parse_field_params
+from users.filters import is_owner_filtered_by_me
+
+
+class ConditionalGetMixin:
+    """
+    Поддерживает условные GET-запросы (If-None-Match / If-Modified-Since)
+    для list и retrieve. ETag строится по поколениям моделей из cache_models,
+    Last-Modified - по полю updated_at объекта или по времени последнего
+    изменения моделей, поэтому ответ 304 отдается без сериализации данных.
+
+    Если ответ содержит данные конкретного пользователя (is_subscribed),
+    cache_per_user разделяет версии ответа по пользователям. Ответы на
+    запросы ?owner=me разделяются по пользователям всегда.
+    """
+
+    cache_models = ()
+    cache_per_user = True
+
+    def get_cache_scope(self):
+        user = self.request.user
+        personal = self.cache_per_user or is_owner_filtered_by_me(self.request)
+        if personal and user.is_authenticated:
+            return f"user:{user.pk}"
+        return "anonymous"
+
+    def get_permission_object(self):
+        """
+        Проверяет права на объект по облегченной выборке,
+        не загружая вложенные данные.
+        """
+
+        if not hasattr(self, "_permission_object"):
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = self.queryset.model.objects.only("pk", "owner", "updated_at")
+            obj = get_object_or_404(
+                queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+            self.check_object_permissions(self.request, obj)
+            self._permission_object = obj
+        return self._permission_object
+
+    def get_last_modified(self, obj=None):
+        if obj is not None:
+            return obj.updated_at.timestamp()
+        # Удаление записей не меняет MAX(updated_at), поэтому для списков
+        # используется время последнего изменения из кэша поколений.
+        return get_last_modified(self.cache_models)
+
+    def get_conditional_response(self, render, obj=None):
+        etag = build_etag(self.request, self.cache_models, self.get_cache_scope())
+        last_modified = int(self.get_last_modified(obj))
+
+        response = get_conditional_response(
+            self.request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = render()
+        if getattr(response, "is_stale", False):
+            # Устаревший ответ не должен закрепиться у клиента под новой версией
+            return response
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            lambda: self.render_list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        obj = self.get_permission_object()
+        return self.get_conditional_response(
+            lambda: self.render_retrieve(request, *args, **kwargs), obj
+        )
+
+    def render_list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def render_retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """
+    Кэширует ответы list и retrieve по адресу, параметрам запроса и
+    поколениям моделей из cache_models. Промахи кэша вычисляются одним
+    воркером, остальные запросы ждут его результат (single-flight).
+    """
+
+    def get_cached_response(self, compute):
+        scope = self.get_cache_scope()
+        data, is_stale = get_or_compute(
+            build_cache_key(self.request, self.cache_models, scope),
+            build_stale_key(self.request, scope),
+            compute,
+        )
+        response = Response(data)
+        response.is_stale = is_stale
+        return response
+
+    def render_list(self, request, *args, **kwargs):
+        parent = super()
+        return self.get_cached_response(
+            lambda: parent.render_list(request, *args, **kwargs).data
+        )
+
+    def render_retrieve(self, request, *args, **kwargs):
+        parent = super()
+        return self.get_cached_response(
+            lambda: parent.render_retrieve(request, *args, **kwargs).data
+        )
+
+
+class ModuleTreeMixin:
+    """
+    Быстрые пути чтения дерева модулей, выбираемые настройкой
+    MODULES_TREE_RENDERER, в обход сериализаторов DRF:
+    - "sql" - документ строится одним запросом в PostgreSQL;
+    - "snapshot" - документ берется из заранее построенного снимка модуля.
+
+    Запросы с ?fields= или ?expand= всегда обрабатываются сериализаторами.
+    """
+
+    tree_renderers = {"sql": sql, "snapshot": snapshots}
+
+    def get_tree_renderer(self):
+        renderer = self.tree_renderers.get(settings.MODULES_TREE_RENDERER)
+        if renderer is None or parse_field_params(self.request) != (None, None):
+            return None
+        if renderer is sql and connection.vendor != "postgresql":
+            return None
+        return renderer
+
+    def list(self, request, *args, **kwargs):
+        renderer = self.get_tree_renderer()
+        if renderer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(Module.objects.only("pk").order_by("pk"))
+        page = self.paginate_queryset(queryset)
+        objects = page if page is not None else queryset
+        data = RawJSON(renderer.render_modules([obj.pk for obj in objects], request))
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        renderer = self.get_tree_renderer()
+        if renderer is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            pk = Module._meta.pk.to_python(self.kwargs[lookup_url_kwarg])
+        except DjangoValidationError:
+            raise Http404
+        document = renderer.render_module(pk, request)
+        if document is None:
+            raise Http404
+        return Response(RawJSON(document))
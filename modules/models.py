@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.expressions import RawSQL
 
 from config import settings
 
@@ -17,6 +18,13 @@ class Module(models.Model):
         verbose_name="Владелец",
     )
     price = models.PositiveIntegerField(default="10000", verbose_name="Цена модуля")
+    courses_in_module_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество курсов"
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество подписчиков"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
 
     def __str__(self):
         return f"{self.title} {self.owner}"
@@ -25,6 +33,10 @@ class Module(models.Model):
         verbose_name = "Модуль"
         verbose_name_plural = "Модули"
         ordering = ("pk",)
+        indexes = [
+            # Выборка модулей владельца (?owner=) в порядке пагинации
+            models.Index(fields=["owner", "id"], name="module_owner_id_idx"),
+        ]
 
 
 class Course(models.Model):
@@ -49,6 +61,13 @@ class Course(models.Model):
         verbose_name="Владелец",
     )
     price = models.PositiveIntegerField(default="5000", verbose_name="Цена курса")
+    lessons_in_course_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество уроков"
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество подписчиков"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
 
     def __str__(self):
         return f"{self.title}, {self.module}, {self.price}"
@@ -56,6 +75,9 @@ class Course(models.Model):
     class Meta:
         verbose_name = "Курс"
         verbose_name_plural = "Курсы"
+        indexes = [
+            models.Index(fields=["owner", "id"], name="course_owner_id_idx"),
+        ]
 
 
 class Lesson(models.Model):
@@ -80,6 +102,7 @@ class Lesson(models.Model):
         **NULLABLE,
         verbose_name="Владелец",
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
 
     def __str__(self):
         return f"{self.title}, {self.course}"
@@ -87,6 +110,9 @@ class Lesson(models.Model):
     class Meta:
         verbose_name = "Урок"
         verbose_name_plural = "Уроки"
+        indexes = [
+            models.Index(fields=["owner", "id"], name="lesson_owner_id_idx"),
+        ]
 
 
 class Subscription(models.Model):
@@ -97,10 +123,13 @@ class Subscription(models.Model):
         ("course", "Курс"),
     ]
 
+    # Отдельные индексы внешних ключей не создаются: их покрывают
+    # составные индексы и ограничения уникальности из Meta
     subscriber = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         verbose_name="Подписчик",
+        db_index=False,
         **NULLABLE,
     )
 
@@ -116,6 +145,7 @@ class Subscription(models.Model):
         on_delete=models.CASCADE,
         verbose_name="Модуль",
         related_name="module_for_subscription",
+        db_index=False,
         **NULLABLE,
     )
 
@@ -124,12 +154,335 @@ class Subscription(models.Model):
         on_delete=models.CASCADE,
         verbose_name="Курс",
         related_name="course_for_subscription",
+        db_index=False,
         **NULLABLE,
     )
+    # Подписка на курс добавлена вместе с подпиской на модуль и удаляется
+    # при отписке от модуля; отдельные подписки на курсы сохраняются
+    via_module = models.BooleanField(
+        default=False, verbose_name="Добавлена подпиской на модуль"
+    )
 
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        indexes = [
+            # Keyset-пагинация и рассылка подписчикам модуля и курса по id
+            models.Index(fields=["module", "id"], name="subscription_module_id_idx"),
+            models.Index(fields=["course", "id"], name="subscription_course_id_idx"),
+            # Подписки пользователя (?owner=) в порядке пагинации
+            models.Index(
+                fields=["subscriber", "id"], name="subscription_subscriber_id_idx"
+            ),
+        ]
+        constraints = [
+            # Уникальные индексы служат и для проверки подписок пользователя
+            models.UniqueConstraint(
+                fields=["subscriber", "module"], name="unique_module_subscription"
+            ),
+            models.UniqueConstraint(
+                fields=["subscriber", "course"], name="unique_course_subscription"
+            ),
+            # Тип подписки соответствует заполненной ссылке на модуль или курс
+            models.CheckConstraint(
+                check=models.Q(subscription_type="module", module__isnull=False)
+                | models.Q(subscription_type="course", course__isnull=False),
+                name="subscription_type_matches_target",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.subscriber}"
+
+    def save(self, *args, **kwargs):
+        # Если указана только одна ссылка, тип подписки определяется по ней
+        if self.module_id is None and self.course_id is not None:
+            self.subscription_type = "course"
+        elif self.course_id is None and self.module_id is not None:
+            self.subscription_type = "module"
+        super().save(*args, **kwargs)
+
+
+# Номер текущей транзакции PostgreSQL (xid8) в виде bigint
+CURRENT_TXID_SQL = "pg_current_xact_id()::text::bigint"
+# Самая ранняя транзакция, которая еще выполняется: все транзакции
+# с меньшими номерами уже зафиксированы или отменены
+SNAPSHOT_XMIN_SQL = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+# Номер собственной транзакции читателя, если она уже что-то изменила
+OWN_TXID_SQL = "pg_current_xact_id_if_assigned()::text::bigint"
+
+
+def current_transaction_id():
+    """Вычисляет номер транзакции записи журнала в самом INSERT."""
+
+    return RawSQL(CURRENT_TXID_SQL, [])
+
+
+class CatalogChangeQuerySet(models.QuerySet):
+    """
+    Выборки журнала изменений в порядке фиксации транзакций.
+
+    Номера изменений выдаются последовательностью в порядке вставки, а не
+    фиксации: транзакция с меньшим номером может зафиксироваться после того,
+    как читатель прошел больший. Поэтому журнал читается в порядке
+    (txid, id) и только до самой ранней еще выполняющейся транзакции.
+    """
+
+    def committed(self):
+        """
+        Оставляет изменения транзакций, номера которых меньше самой ранней
+        выполняющейся (позже в этот диапазон ничего не добавится),
+        и изменения собственной транзакции читателя.
+
+        Граница (xmin снимка) общая для всего кластера PostgreSQL: одна долгая
+        транзакция в любой базе, в том числе сессия "idle in transaction",
+        останавливает ленту /changes/ и сводку send_digest на своем начале,
+        пока не завершится. Задержанные изменения возвращает held_back(),
+        send_digest пишет о них предупреждение в лог.
+        """
+
+        return self.filter(
+            models.Q(txid__lt=RawSQL(SNAPSHOT_XMIN_SQL, []))
+            | models.Q(txid=RawSQL(OWN_TXID_SQL, []))
+        )
+
+    def after(self, position):
+        """
+        Возвращает изменения после позиции - id последнего прочитанного
+        изменения (0 - с начала журнала) - в порядке (txid, id).
+        """
+
+        txid = None
+        if position:
+            txid = (
+                CatalogChange.objects.filter(pk=position)
+                .values_list("txid", flat=True)
+                .first()
+            )
+        if txid is None:
+            queryset = self.filter(pk__gt=position)
+        else:
+            queryset = self.filter(
+                models.Q(txid__gt=txid) | models.Q(txid=txid, pk__gt=position)
+            )
+        return queryset.order_by("txid", "pk")
+
+    def up_to(self, change):
+        """Оставляет изменения не позже change в порядке (txid, id)."""
+
+        return self.filter(
+            models.Q(txid__lt=change.txid)
+            | models.Q(txid=change.txid, pk__lte=change.pk)
+        )
+
+    def before(self, change):
+        """Оставляет изменения раньше change в порядке (txid, id)."""
+
+        return self.filter(
+            models.Q(txid__lt=change.txid)
+            | models.Q(txid=change.txid, pk__lt=change.pk)
+        )
+
+    def held_back(self):
+        """Оставляет изменения, ожидающие завершения более ранних транзакций."""
+
+        return self.filter(txid__gte=RawSQL(SNAPSHOT_XMIN_SQL, []))
+
+
+class CatalogChange(models.Model):
+    """
+    Журнал изменений каталога для инкрементальной синхронизации клиентов.
+    Первичный ключ служит номером изменения (курсором), порядок чтения
+    задает номер транзакции txid (см. CatalogChangeQuerySet).
+    """
+
+    MODEL_CHOICES = [
+        ("module", "Модуль"),
+        ("course", "Курс"),
+        ("lesson", "Урок"),
+    ]
+    ACTION_CHOICES = [
+        ("created", "Создание"),
+        ("updated", "Изменение"),
+        ("deleted", "Удаление"),
+    ]
+
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES, verbose_name="Модель")
+    object_id = models.PositiveBigIntegerField(verbose_name="ID объекта")
+    action = models.CharField(
+        max_length=10, choices=ACTION_CHOICES, verbose_name="Действие"
+    )
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата изменения")
+    txid = models.PositiveBigIntegerField(
+        default=current_transaction_id, editable=False, verbose_name="Транзакция"
+    )
+
+    objects = CatalogChangeQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.pk}: {self.model} {self.object_id} {self.action}"
+
+    class Meta:
+        verbose_name = "Изменение каталога"
+        verbose_name_plural = "Изменения каталога"
+        ordering = ("pk",)
+        indexes = [
+            # Чтение журнала в порядке фиксации после курсора
+            models.Index(fields=["txid", "id"], name="catalog_change_txid_id_idx"),
+            # Выборка изменений одной модели после курсора (сводки)
+            models.Index(
+                fields=["model", "txid", "id"], name="catalog_change_model_txid_idx"
+            ),
+        ]
+
+
+class ModuleSnapshot(models.Model):
+    """
+    Готовый JSON-документ модуля с курсами и уроками, построенный
+    ModuleSerializer. Пользовательские поля (is_subscribed) хранятся
+    в виде меток и подставляются при выдаче.
+    """
+
+    module = models.OneToOneField(
+        Module,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="snapshot",
+        verbose_name="Модуль",
+    )
+    data = models.TextField(verbose_name="JSON-документ")
+    built_at = models.DateTimeField(auto_now=True, verbose_name="Дата построения")
+    # Дата изменения модуля, по данным которого построен снимок: снимок,
+    # построенный до последнего изменения модуля, не выдается
+    module_updated_at = models.DateTimeField(
+        verbose_name="Дата изменения модуля", **NULLABLE
+    )
+
+    def __str__(self):
+        return f"{self.module_id}: {self.built_at}"
+
+    class Meta:
+        verbose_name = "Снимок модуля"
+        verbose_name_plural = "Снимки модулей"
+
+
+class OutboxEvent(models.Model):
+    """
+    Событие, ожидающее публикации в брокер (transactional outbox).
+    Записывается в одной транзакции с изменением данных и удаляется
+    после публикации.
+    """
+
+    EVENT_CHOICES = [
+        ("module_updated", "Модуль изменен"),
+        ("snapshots_rebuild", "Перестроение снимков модулей"),
+    ]
+
+    event_type = models.CharField(
+        max_length=50, choices=EVENT_CHOICES, verbose_name="Тип события"
+    )
+    payload = models.JSONField(default=dict, verbose_name="Данные")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    def __str__(self):
+        return f"{self.pk}: {self.event_type}"
+
+    class Meta:
+        verbose_name = "Событие outbox"
+        verbose_name_plural = "События outbox"
+        ordering = ("pk",)
+
+
+class NotificationCursor(models.Model):
+    """
+    Позиция обработчика уведомлений в журнале изменений каталога:
+    номер последнего изменения, уже учтенного в рассылке.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True, verbose_name="Название")
+    position = models.PositiveBigIntegerField(
+        default=0, verbose_name="Последнее изменение"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+    class Meta:
+        verbose_name = "Позиция рассылки"
+        verbose_name_plural = "Позиции рассылок"
+
+
+class Notification(models.Model):
+    """
+    Рассылка уведомления подписчикам. Получатели и статус отправки
+    каждому из них хранятся в журнале доставки (Delivery).
+    """
+
+    module = models.ForeignKey(
+        Module,
+        on_delete=models.SET_NULL,
+        verbose_name="Модуль",
+        **NULLABLE,
+    )
+    subject = models.CharField(max_length=255, verbose_name="Тема")
+    message = models.TextField(verbose_name="Текст")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    def __str__(self):
+        return f"{self.pk}: {self.subject}"
+
+    class Meta:
+        verbose_name = "Рассылка"
+        verbose_name_plural = "Рассылки"
+        ordering = ("-pk",)
+
+
+class Delivery(models.Model):
+    """Доставка письма рассылки одному подписчику."""
+
+    STATUS_CHOICES = [
+        ("pending", "Ожидает отправки"),
+        ("sent", "Отправлено"),
+    ]
+
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name="deliveries",
+        verbose_name="Рассылка",
+    )
+    subscriber = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name="Подписчик",
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default="pending", verbose_name="Статус"
+    )
+    sent_at = models.DateTimeField(verbose_name="Дата отправки", **NULLABLE)
+    # Пачка, за которой закреплено письмо, и срок ее аренды: resume_notification
+    # не ставит в очередь повторно письма, закрепленные за другой пачкой
+    claim = models.UUIDField(verbose_name="Пачка отправки", **NULLABLE)
+    claimed_at = models.DateTimeField(verbose_name="Дата закрепления", **NULLABLE)
+
+    def __str__(self):
+        return f"{self.notification_id}: {self.subscriber_id} {self.status}"
+
+    class Meta:
+        verbose_name = "Доставка"
+        verbose_name_plural = "Доставки"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["notification", "subscriber"], name="unique_delivery"
+            ),
+        ]
+        indexes = [
+            # Подсчет прогресса и выборка неотправленных писем рассылки
+            models.Index(
+                fields=["notification", "status", "subscriber"],
+                name="delivery_status_idx",
+            ),
+            # Выборка писем пачки задачей отправки
+            models.Index(fields=["claim"], name="delivery_claim_idx"),
+        ]
@@ -0,0 +1,70 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+
+def iter_chunks(iterable, size):
+    """Разбивает поток значений на списки длиной не более size."""
+
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def build_update_message(module):
+    """Возвращает тему и текст уведомления об обновлении модуля."""
+
+    subject = f"Обновление модуля: '{module.title}'"
+    message = (
+        f"Информируем, что обновлен модуль: '{module.title}'\n"
+        f"\n* Данное сообщение является автоматическим уведомлением "
+        f"и не требует ответа."
+    )
+    return subject, message
+
+
+def build_digest_message(titles):
+    """Возвращает тему и текст сводки об обновлении нескольких модулей."""
+
+    subject = f"Обновления модулей: {len(titles)}"
+    lines = "\n".join(f"- '{title}'" for title in titles)
+    message = (
+        f"Информируем, что обновлены модули, на которые вы подписаны:\n"
+        f"{lines}\n"
+        f"\n* Данное сообщение является автоматическим уведомлением "
+        f"и не требует ответа."
+    )
+    return subject, message
+
+
+def send_personal_messages(messages, connection=None):
+    """
+    Отправляет письма из пар (получатель, (тема, текст)) через одно
+    SMTP-соединение. Возвращает количество отправленных писем.
+    """
+
+    if connection is None:
+        connection = get_connection()
+    messages = [
+        EmailMessage(
+            subject=subject,
+            body=message,
+            from_email=settings.EMAIL_HOST_USER,
+            to=[email],
+            connection=connection,
+        )
+        for email, (subject, message) in messages
+    ]
+    return connection.send_messages(messages) or 0
+
+
+def send_messages(subject, message, recipients, connection=None):
+    """
+    Отправляет каждому получателю отдельное письмо через одно
+    SMTP-соединение. Возвращает количество отправленных писем.
+    """
+
+    return send_personal_messages(
+        ((email, (subject, message)) for email in recipients), connection
+    )
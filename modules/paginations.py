@@ -1,7 +1,104 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+)
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 10
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Пагинация по ключу (pk) с непрозрачным курсором.
+    Не выполняет COUNT(*) и OFFSET, поэтому любая страница стоит как первая.
+    """
+
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 10
+    ordering = "pk"
+
+
+class SwitchablePagination(BasePagination):
+    """
+    Пагинация с выбором режима по параметрам запроса.
+
+    Параметр ``cursor`` или ``pagination=cursor`` включает keyset-пагинацию,
+    параметр ``page`` или ``pagination=page`` - постраничную для старых клиентов.
+    Без параметров используется режим ``default_mode``; ``None`` - список
+    выводится без пагинации.
+    """
+
+    mode_query_param = "pagination"
+    default_mode = "page"
+    paginator_classes = {
+        "page": CustomPagination,
+        "cursor": KeysetPagination,
+    }
+
+    def __init__(self):
+        self.paginator = self.get_paginator(self.default_mode)
+
+    def get_paginator(self, mode):
+        paginator_class = self.paginator_classes.get(mode)
+        return paginator_class() if paginator_class else None
+
+    def get_mode(self, request):
+        """Определяет режим пагинации для запроса."""
+
+        mode = request.query_params.get(self.mode_query_param)
+        if mode in self.paginator_classes:
+            return mode
+        if KeysetPagination.cursor_query_param in request.query_params:
+            return "cursor"
+        if CustomPagination.page_query_param in request.query_params:
+            return "page"
+        return self.default_mode
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(self.get_mode(request))
+        if self.paginator is None:
+            return None
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Режим пагинации: page или cursor",
+                "schema": {"type": "string", "enum": list(self.paginator_classes)},
+            }
+        ]
+        for paginator_class in self.paginator_classes.values():
+            for parameter in paginator_class().get_schema_operation_parameters(view):
+                if parameter["name"] not in [item["name"] for item in parameters]:
+                    parameters.append(parameter)
+        return parameters
+
+    def to_html(self):
+        return self.paginator.to_html() if self.paginator else ""
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, "display_page_controls", False)
+
+
+class OptionalPagination(SwitchablePagination):
+    """
+    Пагинация только по запросу клиента (``pagination``, ``cursor`` или
+    ``page``). Без параметров список выводится целиком, как раньше.
+    """
+
+    default_mode = None
@@ -0,0 +1,59 @@
+from django.db.models import Prefetch
+
+from modules.models import Course, Lesson, Module
+from modules.serializers import get_level_fields, is_expanded
+
+
+def _only(queryset, prefix, fields, required=()):
+    """
+    Ограничивает выборку колонками, запрошенными в ?fields=.
+    Колонки из required нужны для связывания prefetch-запросов.
+    """
+
+    level_fields = get_level_fields(prefix, fields)
+    if level_fields is None:
+        return queryset
+    concrete = {field.name for field in queryset.model._meta.concrete_fields}
+    return queryset.only("id", *required, *(level_fields & concrete))
+
+
+def get_lesson_queryset(fields=None, prefix="", required=()):
+    """Возвращает queryset уроков с учетом запрошенных полей."""
+
+    return _only(Lesson.objects.all(), prefix, fields, required)
+
+
+def get_course_queryset(fields=None, expand=None, prefix="", required=()):
+    """
+    Возвращает queryset курсов, подготовленный для CourseSerializer:
+    уроки подгружаются пачкой, подписка пользователя проверяется
+    загрузчиком подписок. Вложенные объекты, не запрошенные через
+    ?fields=/?expand=, не загружаются.
+    """
+
+    queryset = _only(Course.objects.all(), prefix, fields, required)
+    if is_expanded(f"{prefix}lesson", prefix, fields, expand):
+        lesson_queryset = get_lesson_queryset(
+            fields, prefix=f"{prefix}lesson.", required=("course",)
+        )
+        queryset = queryset.prefetch_related(
+            Prefetch("lesson_set", queryset=lesson_queryset.order_by("pk"))
+        )
+    return queryset
+
+
+def get_module_queryset(fields=None, expand=None):
+    """
+    Возвращает queryset модулей, подготовленный для ModuleSerializer.
+    Количество запросов не зависит от числа курсов и уроков.
+    """
+
+    queryset = _only(Module.objects.all(), "", fields)
+    if is_expanded("course", "", fields, expand):
+        course_queryset = get_course_queryset(
+            fields, expand, prefix="course.", required=("module",)
+        )
+        queryset = queryset.prefetch_related(
+            Prefetch("course_set", queryset=course_queryset.order_by("pk"))
+        )
+    return queryset.order_by("pk")
@@ -0,0 +1,28 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class RawJSON(str):
+    """Готовый JSON-текст, который выводится в ответ без повторной сериализации."""
+
+
+class RawJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер, который выводит RawJSON как есть,
+    в том числе в поле results ответа с пагинацией.
+    """
+
+    placeholder = "__raw_json_results__"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, RawJSON):
+            return data.encode()
+        if isinstance(data, dict) and isinstance(data.get("results"), RawJSON):
+            envelope = super().render(
+                {**data, "results": self.placeholder},
+                accepted_media_type,
+                renderer_context,
+            )
+            return envelope.replace(
+                f'"{self.placeholder}"'.encode(), data["results"].encode()
+            )
+        return super().render(data, accepted_media_type, renderer_context)
@@ -1,66 +1,278 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
+from rest_framework.permissions import SAFE_METHODS
 
+from modules.loaders import get_subscription_loader
 from modules.models import Course, Lesson, Module, Subscription
 from modules.validators import ValidateURLResource
 
 
-class LessonSerializer(serializers.ModelSerializer):
+def parse_field_params(request):
+    """
+    Разбирает параметры ?fields= и ?expand= запроса.
+    Возвращает пару множеств путей вида "course.lesson.title" или None,
+    если параметр не передан.
+    """
+
+    result = []
+    for param in ("fields", "expand"):
+        value = None
+        if request is not None and request.method in SAFE_METHODS:
+            value = request.query_params.get(param)
+        if value is None:
+            result.append(None)
+        else:
+            result.append({item.strip() for item in value.split(",") if item.strip()})
+    return tuple(result)
+
+
+def is_requested(path, paths):
+    """Проверяет, запрошен ли путь сам по себе или через вложенное поле."""
+
+    if paths is None:
+        return True
+    return path in paths or any(item.startswith(f"{path}.") for item in paths)
+
+
+def get_level_fields(prefix, fields):
+    """
+    Возвращает множество полей, запрошенных на уровне prefix,
+    или None, если выбор полей на этом уровне не ограничен.
+    """
+
+    if fields is None:
+        return None
+    level_fields = {
+        item[len(prefix):]
+        for item in fields
+        if item.startswith(prefix) and "." not in item[len(prefix):]
+    }
+    return level_fields or None
+
+
+def is_expanded(path, prefix, fields, expand):
+    """Проверяет, нужно ли выводить вложенный сериализатор по пути path."""
+
+    level_fields = get_level_fields(prefix, fields)
+    if level_fields is not None and not is_requested(path, fields):
+        return False
+    return is_requested(path, expand)
+
+
+class DynamicFieldsMixin:
+    """
+    Позволяет клиенту выбирать поля ответа параметрами запроса:
+    ?fields=id,title,course.title - только перечисленные поля,
+    ?expand=course,course.lesson - только перечисленные вложенные объекты.
+    Без параметров выводятся все поля.
+    """
+
+    expandable_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = parse_field_params(self.context.get("request"))
+        if fields is not None or expand is not None:
+            self.prune_fields(fields, expand)
+
+    def prune_fields(self, fields, expand, prefix=""):
+        """Удаляет из сериализатора поля, которые не запрошены клиентом."""
+
+        level_fields = get_level_fields(prefix, fields)
+        for name in list(self.fields):
+            path = f"{prefix}{name}"
+            if name in self.expandable_fields:
+                if not is_expanded(path, prefix, fields, expand):
+                    self.fields.pop(name)
+                    continue
+                nested = getattr(self.fields[name], "child", self.fields[name])
+                if isinstance(nested, DynamicFieldsMixin):
+                    nested.prune_fields(fields, expand, f"{path}.")
+            elif level_fields is not None and name not in level_fields:
+                self.fields.pop(name)
+
+
+class LessonSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Lesson
         fields = "__all__"
         validators = [ValidateURLResource(field="video")]
 
 
+class PrefetchedQuerySet:
+    """
+    Замена queryset поля PrimaryKeyRelatedField: связанные объекты всех
+    элементов списка загружаются одним запросом, а не по одному на элемент.
+    """
+
+    def __init__(self, queryset, pks):
+        self.model = queryset.model
+        self.objects = queryset.in_bulk(pks)
+
+    def get(self, pk):
+        try:
+            pk = self.model._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise TypeError(pk)
+        try:
+            return self.objects[pk]
+        except KeyError:
+            raise self.model.DoesNotExist
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Проверка списка объектов для массового создания или изменения.
+    Каждый элемент проверяется сериализатором child, ошибки возвращаются
+    списком по элементам. Для изменения instance - словарь {pk: объект},
+    элементы данных ссылаются на него по id. Запись выполняет представление.
+    """
+
+    def prefetch_related_fields(self, data):
+        if not isinstance(data, list):
+            return
+        for name, field in self.child.fields.items():
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                pks = {
+                    item[name]
+                    for item in data
+                    if isinstance(item, dict) and isinstance(item.get(name), int)
+                }
+                field.queryset = PrefetchedQuerySet(field.get_queryset(), pks)
+
+    def run_validation(self, data=serializers.empty):
+        self.prefetch_related_fields(data)
+        return super().run_validation(data)
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            pk = data.get("id") if isinstance(data, dict) else None
+            if not isinstance(pk, int) or pk not in self.instance:
+                raise serializers.ValidationError(
+                    {"id": ["Объект не найден или нет прав на его изменение."]}
+                )
+            self.child.instance = self.instance[pk]
+        return super().run_child_validation(data)
+
+
 class SubscriptionSerializer(serializers.ModelSerializer):
+    def save(self, **kwargs):
+        # Уникальность подписки проверяется ограничениями БД, а не отдельным
+        # SELECT перед записью: так параллельные запросы не создают дублей.
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                "Пользователь уже подписан на этот модуль или курс."
+            )
+
     class Meta:
         model = Subscription
         fields = "__all__"
+        read_only_fields = ("via_module",)
+        validators = []
 
 
-class CourseSerializer(serializers.ModelSerializer):
-    lesson = LessonSerializer(source="lesson_set", many=True, read_only=True)
-    lessons_in_course_count = SerializerMethodField()
-    is_subscribed = SerializerMethodField()
-    subscribers = SubscriptionSerializer(
-        source="course_for_subscription", many=True, read_only=True
-    )
+class SubscribedListSerializer(serializers.ListSerializer):
+    """
+    Перед выводом списка сообщает загрузчику подписок id всех объектов,
+    чтобы признак is_subscribed был получен одним запросом на весь ответ.
+    """
+
+    def to_representation(self, data):
+        items = data.all() if isinstance(data, BaseManager) else data
+        self.child.prime_subscriptions(items)
+        return super().to_representation(items)
+
+
+class SubscribedFieldMixin:
+    """
+    Выводит признак подписки текущего пользователя (is_subscribed)
+    через загрузчик подписок запроса. Вложенные сериализаторы из
+    nested_subscribed_fields подгружаются тем же запросом, если
+    их объекты уже получены через prefetch_related.
+    """
+
+    subscription_type = None
+    nested_subscribed_fields = ()
 
-    def get_lessons_in_course_count(self, obj):
-        return obj.lesson_set.all().count()
+    def get_subscription_loader(self):
+        return get_subscription_loader(self.context.get("request"))
+
+    def prime_subscriptions(self, instances):
+        loader = self.get_subscription_loader()
+        if not loader.is_active:
+            return
+        loader.prime(self.subscription_type, [obj.pk for obj in instances])
+        for name in self.nested_subscribed_fields:
+            field = self.fields.get(name)
+            if field is None:
+                continue
+            nested = []
+            for obj in instances:
+                if field.source in getattr(obj, "_prefetched_objects_cache", {}):
+                    nested.extend(getattr(obj, field.source).all())
+            field.child.prime_subscriptions(nested)
+
+    def to_representation(self, instance):
+        self.prime_subscriptions([instance])
+        return super().to_representation(instance)
 
     def get_is_subscribed(self, obj):
-        request = self.context.get("request")
-        user = None
-        if request:
-            user = request.user
-        return obj.course_for_subscription.filter(subscriber=user).exists()
+        loader = self.get_subscription_loader()
+        return loader.is_subscribed(self.subscription_type, obj.pk)
+
+
+class CourseSerializer(
+    SubscribedFieldMixin, DynamicFieldsMixin, serializers.ModelSerializer
+):
+    lesson = LessonSerializer(source="lesson_set", many=True, read_only=True)
+    is_subscribed = SerializerMethodField()
+
+    expandable_fields = ("lesson",)
+    subscription_type = "course"
 
     class Meta:
         model = Course
         fields = "__all__"
+        read_only_fields = ("lessons_in_course_count", "subscribers_count")
+        list_serializer_class = SubscribedListSerializer
 
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(
+    SubscribedFieldMixin, DynamicFieldsMixin, serializers.ModelSerializer
+):
     """Сериализатор для модели образовательного модуля"""
 
     course = CourseSerializer(source="course_set", many=True, read_only=True)
-    courses_in_module_count = SerializerMethodField()
     is_subscribed = SerializerMethodField()
-    subscribers = SubscriptionSerializer(
-        source="module_for_subscription", many=True, read_only=True
-    )
 
-    def get_courses_in_module_count(self, obj):
-        return obj.course_set.all().count()
+    expandable_fields = ("course",)
+    subscription_type = "module"
+    nested_subscribed_fields = ("course",)
 
-    def get_is_subscribed(self, obj):
-        request = self.context.get("request")
-        user = None
-        if request:
-            user = request.user
-        return obj.module_for_subscription.filter(subscriber=user).exists()
+    class Meta:
+        model = Module
+        fields = "__all__"
+        read_only_fields = ("courses_in_module_count", "subscribers_count")
+        list_serializer_class = SubscribedListSerializer
+
+
+class ModuleChangeSerializer(serializers.ModelSerializer):
+    """Сериализатор модуля без вложенных объектов для ленты изменений"""
 
     class Meta:
         model = Module
         fields = "__all__"
+
+
+class CourseChangeSerializer(serializers.ModelSerializer):
+    """Сериализатор курса без вложенных объектов для ленты изменений"""
+
+    class Meta:
+        model = Course
+        fields = "__all__"
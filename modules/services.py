@@ -0,0 +1,258 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from modules.cache import bump_generation
+from modules.models import (
+    Course,
+    Lesson,
+    Module,
+    ModuleSnapshot,
+    OutboxEvent,
+    Subscription,
+)
+from modules.signals import COUNTED_RELATIONS, change_counters, record_changes, touch
+
+# Денормализованные счетчики: поле счетчика -> (модель связи, внешний ключ)
+MODULE_COUNTERS = {
+    "courses_in_module_count": (Course, "module"),
+    "subscribers_count": (Subscription, "module"),
+}
+COURSE_COUNTERS = {
+    "lessons_in_course_count": (Lesson, "course"),
+    "subscribers_count": (Subscription, "course"),
+}
+
+
+def count_subquery(model, field):
+    """Возвращает подзапрос количества записей model, ссылающихся на OuterRef("pk")."""
+
+    queryset = (
+        model.objects.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(queryset), 0)
+
+
+def _recount(queryset, counters):
+    updated = 0
+    for name, (model, field) in counters.items():
+        actual = count_subquery(model, field)
+        updated += (
+            queryset.annotate(actual=actual)
+            .exclude(**{name: F("actual")})
+            .update(**{name: actual})
+        )
+    return updated
+
+
+def recount_modules(queryset=None):
+    """
+    Пересчитывает счетчики модулей одним UPDATE на каждый счетчик.
+    Возвращает количество исправленных значений.
+    """
+
+    if queryset is None:
+        queryset = Module.objects.all()
+    return _recount(queryset, MODULE_COUNTERS)
+
+
+def recount_courses(queryset=None):
+    """
+    Пересчитывает счетчики курсов одним UPDATE на каждый счетчик.
+    Возвращает количество исправленных значений.
+    """
+
+    if queryset is None:
+        queryset = Course.objects.all()
+    return _recount(queryset, COURSE_COUNTERS)
+
+
+# Переключение подписки на модуль одним запросом: подписка на модуль
+# удаляется (DELETE ... RETURNING) или добавляется (INSERT ... ON CONFLICT),
+# вместе с ней добавляются или удаляются подписки на курсы модуля,
+# созданные ею (via_module), а счетчики подписчиков, даты изменения,
+# снимок модуля и событие его перестроения в outbox (если rebuild)
+# обновляются в том же запросе, в обход сигналов.
+TOGGLE_MODULE_SQL = """
+    WITH module AS (
+        SELECT id FROM {module} WHERE id = %(module_id)s
+    ), deleted AS (
+        DELETE FROM {subscription}
+        WHERE subscriber_id = %(user_id)s AND module_id = %(module_id)s
+        RETURNING id
+    ), inserted AS (
+        INSERT INTO {subscription}
+            (subscriber_id, module_id, subscription_type, via_module)
+        SELECT %(user_id)s, id, 'module', false FROM module
+        WHERE NOT EXISTS (SELECT 1 FROM deleted)
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    ), courses_subscribed AS (
+        INSERT INTO {subscription}
+            (subscriber_id, course_id, subscription_type, via_module)
+        SELECT %(user_id)s, id, 'course', true FROM {course}
+        WHERE module_id = %(module_id)s AND EXISTS (SELECT 1 FROM inserted)
+        ON CONFLICT DO NOTHING
+        RETURNING course_id, 1 AS delta
+    ), courses_unsubscribed AS (
+        DELETE FROM {subscription}
+        WHERE subscriber_id = %(user_id)s AND via_module
+            AND course_id IN (SELECT id FROM {course} WHERE module_id = %(module_id)s)
+            AND EXISTS (SELECT 1 FROM deleted)
+        RETURNING course_id, -1 AS delta
+    ), courses_changed AS (
+        SELECT * FROM courses_subscribed
+        UNION ALL
+        SELECT * FROM courses_unsubscribed
+    ), courses AS (
+        UPDATE {course} c
+        SET subscribers_count = GREATEST(c.subscribers_count + changed.delta, 0),
+            updated_at = %(now)s
+        FROM courses_changed changed
+        WHERE c.id = changed.course_id
+        RETURNING c.id
+    ), modules AS (
+        UPDATE {module}
+        SET subscribers_count = GREATEST(
+                subscribers_count
+                + (SELECT count(*) FROM inserted)
+                - (SELECT count(*) FROM deleted),
+                0
+            ),
+            updated_at = %(now)s
+        WHERE id = %(module_id)s AND (
+            EXISTS (SELECT 1 FROM inserted)
+            OR EXISTS (SELECT 1 FROM deleted)
+            OR EXISTS (SELECT 1 FROM courses_changed)
+        )
+        RETURNING id
+    ), snapshots AS (
+        DELETE FROM {snapshot} WHERE module_id IN (SELECT id FROM modules)
+    ), events AS (
+        INSERT INTO {outbox} (event_type, payload, created_at)
+        SELECT 'snapshots_rebuild',
+            jsonb_build_object('module_ids', jsonb_build_array(id)), %(now)s
+        FROM modules WHERE %(rebuild)s
+    )
+    SELECT
+        EXISTS (SELECT 1 FROM module),
+        EXISTS (SELECT 1 FROM deleted),
+        (SELECT count(*) FROM courses),
+        EXISTS (SELECT 1 FROM modules)
+"""
+
+
+def _execute(sql, params):
+    tables = {
+        "module": Module._meta.db_table,
+        "course": Course._meta.db_table,
+        "subscription": Subscription._meta.db_table,
+        "snapshot": ModuleSnapshot._meta.db_table,
+        "outbox": OutboxEvent._meta.db_table,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(**tables), params)
+        return cursor.fetchall()
+
+
+def toggle_module_subscription(user, module_id):
+    """
+    Переключает подписку пользователя на модуль вместе с подписками
+    на курсы модуля одним запросом (TOGGLE_MODULE_SQL), поэтому повторные
+    параллельные запросы не создают дублей. Отписка удаляет только подписки
+    на курсы, добавленные подпиской на модуль.
+
+    Возвращает пару (подписка добавлена, количество измененных подписок
+    на курсы) или None, если модуль не найден.
+    """
+
+    params = {
+        "user_id": user.pk,
+        "module_id": module_id,
+        "now": timezone.now(),
+        "rebuild": settings.MODULES_TREE_RENDERER == "snapshot",
+    }
+    [(exists, deleted, courses_count, changed)] = _execute(TOGGLE_MODULE_SQL, params)
+    if not exists:
+        return None
+    if changed:
+        # Подписки меняют только счетчики: в журнал изменений они не попадают
+        bump_generation(Subscription)
+    return not deleted, courses_count
+
+
+def _update_parents(model, objs, previous=None):
+    """
+    Обновляет счетчики и даты изменения родителей записей, сохраненных
+    в обход сигналов. previous - словарь {pk: {внешний ключ: id родителя}}
+    до изменения, для новых записей не передается.
+    """
+
+    previous = previous or {}
+    for field, parent_model, counter in COUNTED_RELATIONS[model]:
+        deltas = Counter()
+        parent_ids = set()
+        for obj in objs:
+            current_id = getattr(obj, field)
+            previous_id = previous.get(obj.pk, {}).get(field)
+            parent_ids |= {current_id, previous_id}
+            if obj.pk not in previous:
+                deltas[current_id] += 1
+            elif previous_id != current_id:
+                deltas[current_id] += 1
+                deltas[previous_id] -= 1
+        # Один UPDATE на каждое значение изменения счетчика
+        pks_by_delta = defaultdict(list)
+        for pk, delta in deltas.items():
+            pks_by_delta[delta].append(pk)
+        for delta, pks in pks_by_delta.items():
+            change_counters(parent_model, pks, counter, delta)
+        touch(parent_model, parent_ids)
+
+
+def bulk_create_objects(model, objs):
+    """
+    Создает курсы или уроки одним INSERT в транзакции. bulk_create
+    не отправляет сигналы, поэтому счетчики и даты изменения родителей,
+    журнал изменений и кэш обновляются так же, как обработчиками сигналов.
+    """
+
+    with transaction.atomic():
+        objs = model.objects.bulk_create(objs)
+        _update_parents(model, objs)
+        record_changes(model, [obj.pk for obj in objs], "created")
+        bump_generation(model)
+    return objs
+
+
+def bulk_update_objects(model, objs, fields):
+    """
+    Сохраняет изменения полей fields курсов или уроков одним UPDATE
+    в транзакции и выполняет работу обработчиков сигналов сохранения.
+    """
+
+    relation_fields = [field for field, _, _ in COUNTED_RELATIONS[model]]
+    with transaction.atomic():
+        previous = {
+            row["pk"]: row
+            for row in model.objects.filter(pk__in=[obj.pk for obj in objs]).values(
+                "pk", *relation_fields
+            )
+        }
+        # bulk_update не заполняет поля auto_now
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        model.objects.bulk_update(objs, [*fields, "updated_at"])
+        _update_parents(model, objs, previous)
+        record_changes(model, [obj.pk for obj in objs], "updated")
+        bump_generation(model)
+    return objs
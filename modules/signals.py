@@ -0,0 +1,212 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from modules.cache import bump_generation
+from modules.models import (
+    CatalogChange,
+    Course,
+    Lesson,
+    Module,
+    ModuleSnapshot,
+    OutboxEvent,
+    Subscription,
+)
+
+# Модель -> список (внешний ключ, родительская модель, поле счетчика)
+COUNTED_RELATIONS = {
+    Course: [("module_id", Module, "courses_in_module_count")],
+    Lesson: [("course_id", Course, "lessons_in_course_count")],
+    Subscription: [
+        ("module_id", Module, "subscribers_count"),
+        ("course_id", Course, "subscribers_count"),
+    ],
+}
+
+
+def change_counters(model, pks, field, delta):
+    """Атомарно изменяет счетчик родительских записей через F-выражение."""
+
+    pks = [pk for pk in pks if pk is not None]
+    if not pks or not delta:
+        return
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        # Счетчик не может уйти в минус даже при рассинхронизации
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счетчик родительской записи через F-выражение."""
+
+    change_counters(model, [pk], field, delta)
+
+
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=Subscription)
+def remember_parents(sender, instance, raw=False, **kwargs):
+    """Запоминает родителей до сохранения, чтобы отследить перенос записи."""
+
+    if raw or instance._state.adding or instance.pk is None:
+        instance._previous_parents = {}
+        return
+    fields = [field for field, _, _ in COUNTED_RELATIONS[sender]]
+    instance._previous_parents = (
+        sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+    )
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Subscription)
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    """Обновляет счетчики при создании записи или переносе к другому родителю."""
+
+    if raw:
+        return
+    previous = getattr(instance, "_previous_parents", {})
+    for field, parent_model, counter in COUNTED_RELATIONS[sender]:
+        current_id = getattr(instance, field)
+        previous_id = None if created else previous.get(field, current_id)
+        if previous_id == current_id:
+            continue
+        change_counter(parent_model, previous_id, counter, -1)
+        change_counter(parent_model, current_id, counter, 1)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Subscription)
+def update_counters_on_delete(sender, instance, **kwargs):
+    """Уменьшает счетчики родителей при удалении записи."""
+
+    for field, parent_model, counter in COUNTED_RELATIONS[sender]:
+        change_counter(parent_model, getattr(instance, field), counter, -1)
+
+
+def record_changes(model, pks, action):
+    """Добавляет записи в журнал изменений каталога."""
+
+    CatalogChange.objects.bulk_create(
+        CatalogChange(model=model._meta.model_name, object_id=pk, action=action)
+        for pk in pks
+    )
+
+
+def invalidate_snapshots(module_ids):
+    """
+    Удаляет устаревшие снимки модулей и записывает событие их перестроения
+    в outbox.
+    """
+
+    module_ids = sorted({pk for pk in module_ids if pk is not None})
+    if not module_ids:
+        return
+    ModuleSnapshot.objects.filter(module_id__in=module_ids).delete()
+    schedule_snapshots_rebuild(module_ids)
+
+
+def schedule_snapshots_rebuild(module_ids):
+    """
+    Записывает в outbox событие перестроения снимков модулей в транзакции
+    изменения: задачу перестроения публикует relay_outbox, поэтому запрос
+    не ждет брокер, а событие не теряется при его недоступности.
+    """
+
+    if settings.MODULES_TREE_RENDERER == "snapshot":
+        OutboxEvent.objects.create(
+            event_type="snapshots_rebuild", payload={"module_ids": list(module_ids)}
+        )
+
+
+def touch(model, pks, record=True):
+    """
+    Обновляет дату изменения записей и их родителей:
+    изменение урока отражается на курсе и модуле, изменение курса - на модуле.
+    Измененные родители попадают в журнал изменений, если record=True:
+    подписки меняют только счетчики и не считаются изменением содержимого
+    каталога (иначе каждая подписка попадала бы в сводку подписчикам).
+    """
+
+    pks = {pk for pk in pks if pk is not None}
+    if not pks:
+        return
+    now = timezone.now()
+    model.objects.filter(pk__in=pks).update(updated_at=now)
+    if record:
+        record_changes(model, pks, "updated")
+    if model is Module:
+        invalidate_snapshots(pks)
+    if model is Course:
+        touch(
+            Module,
+            Course.objects.filter(pk__in=pks).values_list("module_id", flat=True),
+            record,
+        )
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Subscription)
+def touch_parents(sender, instance, raw=False, **kwargs):
+    """Отмечает родительские модули и курсы как измененные."""
+
+    if raw:
+        return
+    previous = getattr(instance, "_previous_parents", {})
+    for field, parent_model, _ in COUNTED_RELATIONS[sender]:
+        touch(
+            parent_model,
+            [getattr(instance, field), previous.get(field)],
+            record=sender is not Subscription,
+        )
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Subscription)
+def invalidate_cached_responses(sender, **kwargs):
+    """Сбрасывает закэшированные ответы каталога, зависящие от модели."""
+
+    bump_generation(sender)
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def record_save(sender, instance, created, raw=False, **kwargs):
+    """Записывает создание или изменение объекта каталога в журнал."""
+
+    if raw:
+        return
+    record_changes(sender, [instance.pk], "created" if created else "updated")
+
+
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+def record_delete(sender, instance, **kwargs):
+    """Записывает удаление объекта каталога в журнал (tombstone)."""
+
+    record_changes(sender, [instance.pk], "deleted")
+
+
+@receiver(post_save, sender=Module)
+def invalidate_module_snapshot(sender, instance, raw=False, **kwargs):
+    """Перестраивает снимок модуля после изменения его полей."""
+
+    if raw:
+        return
+    invalidate_snapshots([instance.pk])
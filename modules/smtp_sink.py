@@ -0,0 +1,75 @@
+import socketserver
+import threading
+import time
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-сервер: принимает письма и считает их, не сохраняя."""
+
+    def reply(self, line):
+        self.wfile.write(line + b"\r\n")
+
+    def handle(self):
+        self.reply(b"220 smtp-sink ready")
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.reply(b"250-smtp-sink")
+                self.reply(b"250 8BITMIME")
+            elif command == b"DATA":
+                self.reply(b"354 End data with <CR><LF>.<CR><LF>")
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                time.sleep(self.server.latency)
+                self.server.count_message()
+                self.reply(b"250 OK")
+            elif command == b"QUIT":
+                self.reply(b"221 Bye")
+                return
+            else:
+                self.reply(b"250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Локальная замена SMTP-сервера для замеров пропускной способности
+    рассылки. Используется как контекстный менеджер:
+
+        with SMTPSink() as sink:
+            ... отправка на sink.host:sink.port ...
+            sink.received
+
+    latency задает задержку ответа на каждое письмо, сек., - имитацию
+    сетевой задержки удаленного SMTP-сервера.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0):
+        super().__init__((host, port), SMTPSinkHandler)
+        self.latency = latency
+        self.received = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def host(self):
+        return self.server_address[0]
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def count_message(self):
+        with self._lock:
+            self.received += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
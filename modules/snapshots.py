@@ -0,0 +1,116 @@
+import re
+
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from modules.loaders import get_subscription_loader
+from modules.models import ModuleSnapshot
+from modules.querysets import get_module_queryset
+from modules.serializers import ModuleSerializer
+
+# Метка признака подписки в снимке: подставляется для каждого пользователя.
+SUBSCRIBED_PLACEHOLDER = "__subscribed__:{}:{}"
+# Метки ищутся вместе с ключом и кавычками JSON, поэтому текст из данных
+# пользователя (где кавычки экранированы) с ними совпасть не может.
+SUBSCRIBED_RE = re.compile(r'"is_subscribed":"__subscribed__:(module|course):(\d+)"')
+RELATIVE_PREVIEW = '"preview":"/'
+
+# Снимок не перезаписывается снимком, построенным по более старым данным
+# модуля: построение, начатое до изменения модуля, может закончиться позже
+# перестроения после изменения.
+UPSERT_SNAPSHOTS_SQL = """
+    INSERT INTO {snapshot} AS s (module_id, data, module_updated_at, built_at)
+    VALUES {values}
+    ON CONFLICT (module_id) DO UPDATE
+    SET data = EXCLUDED.data,
+        module_updated_at = EXCLUDED.module_updated_at,
+        built_at = EXCLUDED.built_at
+    WHERE s.module_updated_at IS NULL
+        OR s.module_updated_at <= EXCLUDED.module_updated_at
+"""
+
+
+def build_snapshots(module_ids):
+    """
+    Строит и сохраняет снимки модулей сериализатором ModuleSerializer.
+    Возвращает словарь {id модуля: JSON-документ}, удаленные модули пропускаются.
+    """
+
+    snapshots = {}
+    rows = []
+    now = timezone.now()
+    for module in get_module_queryset().filter(pk__in=module_ids):
+        data = ModuleSerializer(module).data
+        data["is_subscribed"] = SUBSCRIBED_PLACEHOLDER.format("module", module.pk)
+        for course in data["course"]:
+            course["is_subscribed"] = SUBSCRIBED_PLACEHOLDER.format(
+                "course", course["id"]
+            )
+        snapshots[module.pk] = JSONRenderer().render(data).decode()
+        rows += [module.pk, snapshots[module.pk], module.updated_at, now]
+    if snapshots:
+        sql = UPSERT_SNAPSHOTS_SQL.format(
+            snapshot=ModuleSnapshot._meta.db_table,
+            values=", ".join(["(%s, %s, %s, %s)"] * len(snapshots)),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, rows)
+    return snapshots
+
+
+def get_snapshots(module_ids):
+    """
+    Возвращает снимки модулей, достраивая отсутствующие и построенные
+    до последнего изменения модуля.
+    """
+
+    documents = dict(
+        ModuleSnapshot.objects.filter(
+            module_id__in=module_ids, module_updated_at=F("module__updated_at")
+        ).values_list("module_id", "data")
+    )
+    missing = [pk for pk in module_ids if pk not in documents]
+    if missing:
+        documents.update(build_snapshots(missing))
+    return documents
+
+
+def personalize(text, request=None):
+    """
+    Подставляет в JSON-текст снимков признаки подписки пользователя
+    и абсолютные адреса изображений, не разбирая документ.
+    """
+
+    loader = get_subscription_loader(request)
+    for model, pk in SUBSCRIBED_RE.findall(text):
+        loader.prime(model, [int(pk)])
+
+    def replace(match):
+        value = loader.is_subscribed(match[1], int(match[2]))
+        return f'"is_subscribed":{"true" if value else "false"}'
+
+    text = SUBSCRIBED_RE.sub(replace, text)
+    if request is not None:
+        text = text.replace(
+            RELATIVE_PREVIEW, f'"preview":"{request.build_absolute_uri("/")}'
+        )
+    return text
+
+
+def render_modules(ids, request=None):
+    """Собирает JSON-массив модулей из снимков в порядке ids."""
+
+    documents = get_snapshots(ids)
+    text = ",".join(documents[pk] for pk in ids if pk in documents)
+    return personalize(f"[{text}]", request)
+
+
+def render_module(pk, request=None):
+    """Возвращает JSON-документ модуля из снимка или None, если модуля нет."""
+
+    document = get_snapshots([pk]).get(pk)
+    if document is None:
+        return None
+    return personalize(document, request)
@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db import connection
+
+from modules.models import Course, Lesson, Module, Subscription
+
+# Формат даты как у rest_framework.fields.DateTimeField: микросекунды
+# выводятся только если они не равны нулю, UTC обозначается суффиксом Z.
+DATETIME_SQL = """(
+    to_char({column} AT TIME ZONE %(time_zone)s, 'YYYY-MM-DD"T"HH24:MI:SS')
+    || CASE WHEN date_part('microseconds', {column})::bigint %% 1000000 = 0
+        THEN '' ELSE to_char({column} AT TIME ZONE %(time_zone)s, '.US') END
+    || 'Z'
+)"""
+
+IMAGE_SQL = """CASE WHEN COALESCE({column}, '') = '' THEN NULL
+    ELSE %(media_prefix)s || {column} END"""
+
+IS_SUBSCRIBED_SQL = """EXISTS(
+    SELECT 1 FROM {subscription} s
+    WHERE s.{field} = {parent}.id AND s.subscriber_id = %(user_id)s
+)"""
+
+LESSON_SQL = """COALESCE((
+    SELECT json_agg(json_build_object(
+        'id', l.id,
+        'title', l.title,
+        'description', l.description,
+        'preview', {preview},
+        'video', l.video,
+        'updated_at', {updated_at},
+        'course', l.course_id,
+        'owner', l.owner_id
+    ) ORDER BY l.id)
+    FROM {lesson} l WHERE l.course_id = c.id
+), '[]'::json)"""
+
+COURSE_SQL = """COALESCE((
+    SELECT json_agg(json_build_object(
+        'id', c.id,
+        'lesson', {lessons},
+        'is_subscribed', {is_subscribed},
+        'title', c.title,
+        'preview', {preview},
+        'description', c.description,
+        'price', c.price,
+        'lessons_in_course_count', c.lessons_in_course_count,
+        'subscribers_count', c.subscribers_count,
+        'updated_at', {updated_at},
+        'module', c.module_id,
+        'owner', c.owner_id
+    ) ORDER BY c.id)
+    FROM {course} c WHERE c.module_id = m.id
+), '[]'::json)"""
+
+MODULE_SQL = """json_build_object(
+    'id', m.id,
+    'course', {courses},
+    'is_subscribed', {is_subscribed},
+    'title', m.title,
+    'description', m.description,
+    'price', m.price,
+    'courses_in_module_count', m.courses_in_module_count,
+    'subscribers_count', m.subscribers_count,
+    'updated_at', {updated_at},
+    'owner', m.owner_id
+)"""
+
+
+def _build_module_sql():
+    subscription = Subscription._meta.db_table
+    lessons = LESSON_SQL.format(
+        lesson=Lesson._meta.db_table,
+        preview=IMAGE_SQL.format(column="l.preview"),
+        updated_at=DATETIME_SQL.format(column="l.updated_at"),
+    )
+    courses = COURSE_SQL.format(
+        course=Course._meta.db_table,
+        lessons=lessons,
+        is_subscribed=IS_SUBSCRIBED_SQL.format(
+            subscription=subscription, field="course_id", parent="c"
+        ),
+        preview=IMAGE_SQL.format(column="c.preview"),
+        updated_at=DATETIME_SQL.format(column="c.updated_at"),
+    )
+    return MODULE_SQL.format(
+        courses=courses,
+        is_subscribed=IS_SUBSCRIBED_SQL.format(
+            subscription=subscription, field="module_id", parent="m"
+        ),
+        updated_at=DATETIME_SQL.format(column="m.updated_at"),
+    )
+
+
+def _get_params(request, ids):
+    user = getattr(request, "user", None)
+    storage = Course._meta.get_field("preview").storage
+    media_prefix = storage.url("")
+    if request is not None:
+        media_prefix = request.build_absolute_uri(media_prefix)
+    return {
+        "ids": list(ids),
+        "user_id": user.pk if user is not None and user.is_authenticated else None,
+        "media_prefix": media_prefix,
+        "time_zone": settings.TIME_ZONE,
+    }
+
+
+def render_modules(ids, request=None):
+    """
+    Строит JSON-массив модулей с курсами и уроками одним
+    SQL-запросом (json_build_object/json_agg). Структура документа совпадает
+    с ModuleSerializer, порядок модулей - с порядком ids.
+    """
+
+    sql = f"""
+        SELECT COALESCE(json_agg(
+            {_build_module_sql()}
+            ORDER BY array_position(%(ids)s::bigint[], m.id)
+        ), '[]'::json)::text
+        FROM {Module._meta.db_table} m
+        WHERE m.id = ANY(%(ids)s::bigint[])
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, _get_params(request, ids))
+        return cursor.fetchone()[0]
+
+
+def render_module(pk, request=None):
+    """Строит JSON-документ одного модуля или возвращает None, если его нет."""
+
+    sql = f"""
+        SELECT {_build_module_sql()}::text
+        FROM {Module._meta.db_table} m
+        WHERE m.id = %(pk)s
+    """
+    params = _get_params(request, [pk])
+    params["pk"] = pk
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
@@ -1,24 +1,336 @@
-import typing
+import logging
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
 
-from celery import shared_task
+from celery import current_app, group, shared_task
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
 
-from modules.models import Subscription
+from modules.deliveries import (
+    claim_deliveries,
+    create_deliveries,
+    deliver,
+    iter_pending,
+    release_claim,
+)
+from modules.models import (
+    CatalogChange,
+    Module,
+    Notification,
+    NotificationCursor,
+    OutboxEvent,
+    Subscription,
+)
+from modules.notifications import (
+    build_digest_message,
+    build_update_message,
+    iter_chunks,
+    send_personal_messages,
+)
+from modules.snapshots import build_snapshots
+
+logger = logging.getLogger(__name__)
+
+# Ключ отложенного уведомления об обновлении модуля
+PENDING_UPDATE_KEY = "notifications:pending:{}"
+# Позиция сводной рассылки в журнале изменений каталога
+DIGEST_CURSOR = "digest"
+# Количество повторов пачки писем при ошибках SMTP
+EMAIL_MAX_RETRIES = 5
+# Задачи отправки писем подтверждаются после выполнения, поэтому при потере
+# воркера брокер выдает их повторно; при ошибках SMTP они повторяются
+# с растущей задержкой
+EMAIL_TASK_OPTIONS = {
+    "acks_late": True,
+    "reject_on_worker_lost": True,
+    "autoretry_for": (OSError,),
+    "max_retries": EMAIL_MAX_RETRIES,
+    "retry_backoff": True,
+}
+
+
+@shared_task
+def send_updates(module_id: int) -> int:
+    """
+    Рассылает уведомление об обновлении модуля подписчикам.
+
+    Рассылка и ее получатели записываются в журнал доставки, после чего
+    отправка ставится в очередь пачками (resume_notification).
+    Возвращает id рассылки.
+    """
+
+    module = Module.objects.filter(pk=module_id).only("title").first()
+    if module is None:
+        return None
+    subject, message = build_update_message(module)
+    notification = Notification.objects.create(
+        module=module, subject=subject, message=message
+    )
+    create_deliveries(notification)
+    resume_notification(notification.pk)
+    return notification.pk
 
 
 @shared_task
-def send_updates(item: typing.Any) -> typing.Any:
-    """Отправляет уведомления об обновлениях модуля на почту подписчикам."""
-
-    active_subscriptions = Subscription.objects.filter(module=item)
-    if active_subscriptions:
-        for item in active_subscriptions:
-            send_mail(
-                subject=f"Обновление модуля: '{item.module.title}'",
-                message=f"Информируем, что обновлен модуль: '{item.module.title}'\n"
-                        f"\n* Данное сообщение является автоматическим уведомлением и не требует ответа.",
-                from_email=settings.EMAIL_HOST_USER,
-                recipient_list=[item.subscriber.email],
-                fail_silently=False,
+def resume_notification(notification_id: int) -> int:
+    """
+    Ставит в очередь отправку писем рассылки, еще не отмеченных в журнале
+    доставки как отправленные. Получатели делятся на пачки по
+    NOTIFICATION_CHUNK_SIZE; письма каждой пачки закрепляются за ней
+    (claim_deliveries), поэтому повторный запуск не ставит в очередь письма
+    пачек, которые еще отправляются. Каждая пачка отправляется отдельной
+    задачей группы через одно SMTP-соединение.
+    Возвращает количество получателей.
+    """
+
+    claims = []
+    for chunk in list(
+        iter_chunks(iter_pending(notification_id), settings.NOTIFICATION_CHUNK_SIZE)
+    ):
+        claim, count = claim_deliveries(notification_id, chunk)
+        if count:
+            claims.append((str(claim), count))
+    if claims:
+        try:
+            group(
+                send_update_emails.s(notification_id, claim) for claim, _ in claims
+            ).apply_async()
+        except Exception:
+            # Задачи не опубликованы: письма не должны ждать истечения аренды
+            for claim, _ in claims:
+                release_claim(claim)
+            raise
+    return sum(count for _, count in claims)
+
+
+@shared_task(bind=True, **EMAIL_TASK_OPTIONS)
+def send_update_emails(self, notification_id: int, claim: str) -> int:
+    """
+    Отправляет письма пачки рассылки через одно SMTP-соединение.
+
+    Повтор задачи (EMAIL_TASK_OPTIONS) пропускает письма, уже отмеченные
+    в журнале доставки. После последней неудачной попытки письма пачки
+    освобождаются, и resume_notification снова ставит их в очередь.
+    """
+
+    try:
+        return deliver(notification_id, claim)
+    except OSError:
+        if self.request.retries >= self.max_retries:
+            release_claim(claim)
+        raise
+
+
+def schedule_update_notification(module_id: int, producer=None) -> bool:
+    """
+    Откладывает уведомление об обновлении модуля на NOTIFICATION_DEBOUNCE
+    секунд. Повторные изменения модуля в течение этого окна объединяются
+    в одно уведомление. Возвращает True, если запланирована новая рассылка.
+    """
+
+    window = settings.NOTIFICATION_DEBOUNCE
+    key = PENDING_UPDATE_KEY.format(module_id)
+    # Ключ живет дольше окна, но не бесконечно: если задача рассылки
+    # потеряется, следующие изменения модуля снова запланируют уведомление.
+    if not cache.add(key, 1, timeout=window * 2):
+        return False
+    try:
+        flush_update_notification.apply_async(
+            (module_id,), countdown=window, producer=producer
+        )
+    except Exception:
+        # Задача не опубликована: окно не должно блокировать следующую попытку
+        cache.delete(key)
+        raise
+    return True
+
+
+@shared_task
+def flush_update_notification(module_id: int) -> None:
+    """Рассылает накопленное за окно уведомление об обновлении модуля."""
+
+    # Изменения, сделанные во время рассылки, попадут в следующее окно
+    cache.delete(PENDING_UPDATE_KEY.format(module_id))
+    send_updates(module_id)
+
+
+@shared_task
+def relay_outbox(batch_size: int = None) -> int:
+    """
+    Публикует события outbox в брокер пачками по OUTBOX_BATCH_SIZE через
+    одно соединение с брокером на пачку: уведомления об изменении модулей
+    и одну задачу перестроения снимков всех модулей пачки. Строки пачки блокируются
+    (SKIP LOCKED), поэтому параллельные ретрансляторы не публикуют событие
+    дважды, а при ошибке брокера транзакция откатывается и события
+    остаются в outbox до следующего запуска.
+    Возвращает количество опубликованных событий.
+    """
+
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    published = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True).order_by(
+                    "pk"
+                )[:batch_size]
             )
+            if not events:
+                return published
+            module_ids = set()
+            rebuild_ids = set()
+            for event in events:
+                if event.event_type == "snapshots_rebuild":
+                    rebuild_ids.update(event.payload["module_ids"])
+                else:
+                    module_ids.add(event.payload["module_id"])
+            with current_app.producer_or_acquire() as producer:
+                for module_id in sorted(module_ids):
+                    schedule_update_notification(module_id, producer=producer)
+                if rebuild_ids:
+                    rebuild_module_snapshots.apply_async(
+                        (sorted(rebuild_ids),), producer=producer
+                    )
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+        published += len(events)
+
+
+def iter_digests(module_ids):
+    """
+    Возвращает поток пар (адрес, (тема, текст)) - по одной сводке на
+    подписчика со всеми измененными модулями, на которые он подписан.
+    """
+
+    titles = dict(
+        Module.objects.filter(pk__in=module_ids).values_list("pk", "title")
+    )
+    rows = (
+        Subscription.objects.filter(module_id__in=titles, subscriber__isnull=False)
+        .order_by("subscriber_id", "module_id")
+        .values_list("subscriber_id", "subscriber__email", "module_id")
+        .iterator(chunk_size=settings.NOTIFICATION_CHUNK_SIZE)
+    )
+    for (_, email), items in groupby(rows, key=itemgetter(0, 1)):
+        yield email, build_digest_message([titles[item[2]] for item in items])
+
+
+@shared_task
+def send_digest() -> int:
+    """
+    Рассылает подписчикам сводку об изменениях модулей с прошлого запуска.
+
+    Измененные модули читаются из журнала изменений каталога после позиции
+    NotificationCursor, поэтому стоимость запуска пропорциональна числу
+    изменений. Позиция сдвигается в одной транзакции с постановкой задач
+    рассылки: при ошибке брокера изменения попадут в следующую сводку.
+    Возвращает количество сводок.
+    """
+
+    warn_held_back_changes()
+    with transaction.atomic():
+        # Конец журнала - последнее изменение зафиксированных транзакций
+        last = (
+            CatalogChange.objects.committed()
+            .order_by("-txid", "-pk")
+            .only("txid")
+            .first()
+        )
+        position = last.pk if last else 0
+        # Первый запуск начинает с текущего конца журнала, а не с его начала
+        cursor, created = NotificationCursor.objects.select_for_update().get_or_create(
+            name=DIGEST_CURSOR, defaults={"position": position}
+        )
+        if created or last is None or cursor.position == position:
+            return 0
+        module_ids = set(
+            CatalogChange.objects.after(cursor.position)
+            .up_to(last)
+            .filter(model="module")
+            .exclude(action="deleted")
+            .values_list("object_id", flat=True)
+        )
+        chunks = list(
+            iter_chunks(iter_digests(module_ids), settings.NOTIFICATION_CHUNK_SIZE)
+        )
+        if chunks:
+            group(send_digest_emails.s(chunk) for chunk in chunks).apply_async()
+        cursor.position = position
+        cursor.save(update_fields=["position", "updated_at"])
+    return sum(len(chunk) for chunk in chunks)
+
+
+def warn_held_back_changes():
+    """
+    Предупреждает в логе, если изменения каталога дольше интервала сводки
+    ждут завершения более ранних транзакций (см. CatalogChangeQuerySet.committed):
+    долгая транзакция в кластере останавливает сводку и ленту /changes/.
+    """
+
+    interval = timedelta(seconds=settings.NOTIFICATION_DIGEST_INTERVAL)
+    oldest = (
+        CatalogChange.objects.held_back()
+        .filter(changed_at__lt=timezone.now() - interval)
+        .order_by("changed_at")
+        .values_list("changed_at", flat=True)
+        .first()
+    )
+    if oldest is not None:
+        logger.warning(
+            "Журнал изменений каталога задержан долгой транзакцией: "
+            "изменение от %s еще не выдано в сводку и ленту /changes/",
+            oldest.isoformat(),
+        )
+
+
+@shared_task(**EMAIL_TASK_OPTIONS)
+def send_digest_emails(digests: list) -> int:
+    """
+    Отправляет пачку сводок через одно SMTP-соединение.
+
+    Позиция сводки сдвигается при постановке пачек в очередь, поэтому
+    пачка не теряется при ошибке SMTP или потере воркера, а повторяется
+    (EMAIL_TASK_OPTIONS). Сводки в журнал доставки не записываются:
+    повтор отправляет пачку целиком, и получатели, которым сводка ушла
+    до сбоя, могут получить ее повторно.
+    """
+
+    return send_personal_messages(digests)
+
+
+@shared_task
+def prune_catalog_changes(batch_size: int = None) -> int:
+    """
+    Удаляет из журнала изменений каталога записи старше
+    CATALOG_CHANGES_RETENTION секунд пачками по CATALOG_CHANGES_PRUNE_BATCH.
+    В режиме сводки удаляются только изменения, уже учтенные в ней (раньше
+    позиции NotificationCursor); сама позиция остается в журнале, чтобы
+    сводка продолжила чтение в порядке фиксации транзакций.
+    Возвращает количество удаленных записей.
+    """
+
+    batch_size = batch_size or settings.CATALOG_CHANGES_PRUNE_BATCH
+    expired = timezone.now() - timedelta(seconds=settings.CATALOG_CHANGES_RETENTION)
+    queryset = CatalogChange.objects.committed().filter(changed_at__lt=expired)
+    cursor = NotificationCursor.objects.filter(name=DIGEST_CURSOR).first()
+    if settings.NOTIFICATION_MODE == "digest" and cursor is not None:
+        position = CatalogChange.objects.filter(pk=cursor.position).first()
+        if position is None:
+            queryset = queryset.filter(pk__lt=cursor.position)
+        else:
+            queryset = queryset.before(position)
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += CatalogChange.objects.filter(pk__in=pks).delete()[0]
+
+
+@shared_task
+def rebuild_module_snapshots(module_ids: list) -> None:
+    """Перестраивает JSON-снимки модулей после изменения их данных."""
+
+    build_snapshots(module_ids)
@@ -1,10 +1,58 @@
+import json
+import tempfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import ANY, Mock, patch
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Q
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
-
-from modules.models import Course, Lesson, Module, Subscription
-from modules.serializers import SubscriptionSerializer
+from rest_framework.fields import DateTimeField
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from config.celery import app as celery_app
+from config.celery import patch_psycopg_for_eventlet
+from modules.cache import LOCK_KEY, get_cache_stats, get_or_compute
+from modules.deliveries import claim_deliveries, create_deliveries, deliver
+from modules.models import (
+    CatalogChange,
+    Course,
+    Delivery,
+    Lesson,
+    Module,
+    ModuleSnapshot,
+    Notification,
+    NotificationCursor,
+    OutboxEvent,
+    Subscription,
+)
+from modules.serializers import ModuleSerializer, SubscriptionSerializer
+from modules.snapshots import build_snapshots
+from modules.tasks import (
+    flush_update_notification,
+    prune_catalog_changes,
+    rebuild_module_snapshots,
+    relay_outbox,
+    resume_notification,
+    schedule_update_notification,
+    send_digest,
+    send_digest_emails,
+    send_update_emails,
+    send_updates,
+)
 from users.models import User
+from users.roles import load_roles
 
 
 class ModuleTestCase(APITestCase):
@@ -268,6 +316,9 @@ class LessonTestCase(APITestCase):
                     "video": "youtube.com/watch/000",
                     "course": None,
                     "owner": self.user.pk,
+                    "updated_at": DateTimeField().to_representation(
+                        self.lesson.updated_at
+                    ),
                 },
             ],
         }
@@ -722,3 +773,1904 @@ class SubscriptionUpdateRetrieveDeleteTestCase(APITestCase):
 
         # Проверка, что доступ запрещён (возвращается статус 404)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ModuleQueryCountTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            email="test5@test.ru",
+            is_superuser=True,
+            is_staff=True,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_modules(self, modules_count, courses_count):
+        """Создает модули с курсами, уроками и подписками."""
+
+        for i in range(modules_count):
+            module = Module.objects.create(title=f"Module {i}", description="-")
+            Subscription.objects.create(subscriber=self.user, module=module)
+            for j in range(courses_count):
+                course = Course.objects.create(
+                    title=f"Course {j}", description="-", module=module
+                )
+                Lesson.objects.create(title="Lesson", description="-", course=course)
+                Subscription.objects.create(subscriber=self.user, course=course)
+
+    def get_queries_count(self, url):
+        """Возвращает количество SQL-запросов, выполненных при GET-запросе."""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_module_list_queries_count(self):
+        """Тест постоянного количества запросов при выводе списка модулей."""
+
+        self.create_modules(modules_count=1, courses_count=1)
+        queries_small = self.get_queries_count("/modules/")
+
+        # Увеличиваем количество модулей, курсов и уроков.
+        self.create_modules(modules_count=4, courses_count=5)
+        queries_large = self.get_queries_count("/modules/")
+
+        self.assertEqual(queries_small, queries_large)
+
+    def test_module_list_annotations(self):
+        """Тест значений счетчиков и признака подписки в списке модулей."""
+
+        self.create_modules(modules_count=1, courses_count=3)
+        response = self.client.get("/modules/")
+        module_data = response.data["results"][0]
+
+        self.assertEqual(module_data["courses_in_module_count"], 3)
+        self.assertTrue(module_data["is_subscribed"])
+        self.assertEqual(module_data["course"][0]["lessons_in_course_count"], 1)
+        self.assertTrue(module_data["course"][0]["is_subscribed"])
+
+    def test_course_list_queries_count(self):
+        """Тест постоянного количества запросов при выводе списка курсов."""
+
+        self.create_modules(modules_count=1, courses_count=1)
+        queries_small = self.get_queries_count(reverse("modules:course_list"))
+
+        self.create_modules(modules_count=1, courses_count=4)
+        queries_large = self.get_queries_count(reverse("modules:course_list"))
+
+        self.assertEqual(queries_small, queries_large)
+
+
+class KeysetPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        self.lessons = [
+            Lesson.objects.create(title=f"Lesson {i}", description="-")
+            for i in range(12)
+        ]
+
+    def test_cursor_pagination(self):
+        """Тест обхода списка уроков по курсору."""
+
+        url = reverse("modules:lesson_list")
+        response = self.client.get(url, {"pagination": "cursor"})
+        ids = []
+
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # В keyset-режиме общее количество записей не вычисляется.
+            self.assertNotIn("count", response.data)
+            ids.extend(item["id"] for item in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        self.assertEqual(ids, [lesson.pk for lesson in self.lessons])
+
+    def test_cursor_pagination_without_count_query(self):
+        """Тест отсутствия COUNT(*) и OFFSET в keyset-режиме."""
+
+        url = reverse("modules:lesson_list")
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, {"pagination": "cursor"})
+
+        sql = " ".join(query["sql"] for query in context.captured_queries).upper()
+        self.assertNotIn("COUNT(", sql)
+        self.assertNotIn("OFFSET", sql)
+
+    def test_page_number_pagination_by_default(self):
+        """Тест сохранения постраничного режима для старых клиентов."""
+
+        response = self.client.get(reverse("modules:lesson_list"), {"page": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 12)
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_subscription_list_unpaginated_by_default(self):
+        """Тест списка подписок без пагинации и keyset-режима по запросу."""
+
+        user = User.objects.create(email="keyset@test.ru")
+        for lesson in self.lessons[:7]:
+            course = Course.objects.create(title=lesson.title, description="-")
+            Subscription.objects.create(subscriber=user, course=course)
+        url = reverse("modules:subscription_list")
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 7)
+
+        response = self.client.get(url, {"pagination": "cursor"})
+        self.assertEqual(len(response.json()["results"]), 5)
+        self.assertTrue(response.json()["next"])
+
+
+class CountersTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="test6@test.ru")
+        self.module = Module.objects.create(title="Module", description="-")
+        self.other_module = Module.objects.create(title="Other", description="-")
+        self.course = Course.objects.create(
+            title="Course", description="-", module=self.module
+        )
+
+    def test_counters_on_create_and_delete(self):
+        """Тест изменения счетчиков при создании и удалении записей."""
+
+        lesson = Lesson.objects.create(
+            title="Lesson", description="-", course=self.course
+        )
+        Subscription.objects.create(subscriber=self.user, module=self.module)
+        self.module.refresh_from_db()
+        self.course.refresh_from_db()
+
+        self.assertEqual(self.module.courses_in_module_count, 1)
+        self.assertEqual(self.module.subscribers_count, 1)
+        self.assertEqual(self.course.lessons_in_course_count, 1)
+
+        lesson.delete()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.lessons_in_course_count, 0)
+
+    def test_counters_on_reparent(self):
+        """Тест изменения счетчиков при переносе курса в другой модуль."""
+
+        self.course.module = self.other_module
+        self.course.save()
+        self.module.refresh_from_db()
+        self.other_module.refresh_from_db()
+
+        self.assertEqual(self.module.courses_in_module_count, 0)
+        self.assertEqual(self.other_module.courses_in_module_count, 1)
+
+    def test_recount_counters_command(self):
+        """Тест исправления рассинхронизированных счетчиков командой."""
+
+        Module.objects.update(courses_in_module_count=10)
+        call_command("recount_counters", stdout=StringIO())
+        self.module.refresh_from_db()
+        self.other_module.refresh_from_db()
+
+        self.assertEqual(self.module.courses_in_module_count, 1)
+        self.assertEqual(self.other_module.courses_in_module_count, 0)
+
+
+class SparseFieldsetsTestCase(APITestCase):
+
+    def setUp(self):
+        self.module = Module.objects.create(title="Module", description="-")
+        self.course = Course.objects.create(
+            title="Course", description="Course description", module=self.module
+        )
+        Lesson.objects.create(
+            title="Lesson", description="Lesson description", course=self.course
+        )
+
+    def test_module_fields(self):
+        """Тест вывода только запрошенных полей модуля и курсов."""
+
+        response = self.client.get(
+            "/modules/", {"fields": "id,title,courses_in_module_count,course.title"}
+        )
+        module_data = response.data["results"][0]
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(module_data), {"id", "title", "courses_in_module_count", "course"}
+        )
+        self.assertEqual(module_data["course"], [{"title": "Course"}])
+
+    def test_module_expand(self):
+        """Тест вывода только явно раскрытых вложенных объектов."""
+
+        response = self.client.get("/modules/", {"expand": "course"})
+        module_data = response.data["results"][0]
+
+        self.assertNotIn("subscribers", module_data)
+        self.assertIn("course", module_data)
+        self.assertNotIn("lesson", module_data["course"][0])
+        self.assertNotIn("subscribers", module_data["course"][0])
+
+    def test_module_sparse_queries(self):
+        """Тест отказа от лишних prefetch-запросов и колонок."""
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get("/modules/", {"fields": "id,title", "expand": ""})
+
+        # Запрос количества записей и запрос самих модулей.
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertNotIn('"description"', context.captured_queries[-1]["sql"])
+
+    def test_lesson_fields(self):
+        """Тест выбора полей в списке уроков."""
+
+        response = self.client.get(reverse("modules:lesson_list"), {"fields": "title"})
+
+        self.assertEqual(response.data["results"], [{"title": "Lesson"}])
+
+
+class ResponseCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.module = Module.objects.create(title="Module", description="-")
+
+    def test_anonymous_module_list_cached(self):
+        """Тест повторной выдачи списка модулей из кэша без запросов к БД."""
+
+        self.client.get("/modules/")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/modules/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(get_cache_stats()["hits"], 1)
+        self.assertEqual(get_cache_stats()["misses"], 1)
+
+    def test_cache_invalidated_on_write(self):
+        """Тест сброса кэша после изменения данных."""
+
+        self.client.get("/modules/")
+        Course.objects.create(title="Course", description="-", module=self.module)
+        response = self.client.get("/modules/")
+
+        self.assertEqual(response.data["results"][0]["courses_in_module_count"], 1)
+        self.assertEqual(len(response.data["results"][0]["course"]), 1)
+
+    def test_authenticated_module_list_cached_per_user(self):
+        """Тест разделения кэша персональных ответов по пользователям."""
+
+        self.client.get("/modules/")
+        user = User.objects.create(email="test7@test.ru")
+        Subscription.objects.create(subscriber=user, module=self.module)
+        self.client.force_authenticate(user=user)
+        response = self.client.get("/modules/")
+
+        self.assertTrue(response.data["results"][0]["is_subscribed"])
+        self.assertEqual(get_cache_stats()["hits"], 0)
+
+
+class SingleFlightTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_waiting_request_coalesced(self):
+        """Тест получения результата, вычисленного другим воркером."""
+
+        cache.add(LOCK_KEY.format("key"), 1)
+        # Имитируем воркер, который завершает пересчет во время ожидания.
+        with patch("modules.cache.time.sleep", lambda _: cache.set("key", "data")):
+            data, is_stale = get_or_compute("key", "stale", lambda: "computed")
+
+        self.assertEqual(data, "data")
+        self.assertFalse(is_stale)
+        self.assertEqual(get_cache_stats()["coalesced"], 1)
+
+    def test_stale_value_served_while_locked(self):
+        """Тест выдачи устаревшего значения во время пересчета."""
+
+        cache.add(LOCK_KEY.format("key"), 1)
+        cache.set("stale", "old data")
+        data, is_stale = get_or_compute("key", "stale", lambda: "computed")
+
+        self.assertEqual(data, "old data")
+        self.assertTrue(is_stale)
+        self.assertEqual(get_cache_stats()["stale"], 1)
+
+    def test_course_retrieve_cached(self):
+        """Тест кэширования детального просмотра курса с проверкой прав."""
+
+        user = User.objects.create(email="test8@test.ru", is_staff=True)
+        course = Course.objects.create(title="Course", description="-", owner=user)
+        self.client.force_authenticate(user=user)
+        url = reverse("modules:course_retrieve", args=(course.pk,))
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        sql = " ".join(query["sql"] for query in context.captured_queries)
+        self.assertEqual(response.data["title"], "Course")
+        # Остается только облегченная выборка для проверки владельца.
+        self.assertNotIn("modules_lesson", sql)
+        self.assertNotIn("modules_subscription", sql)
+
+        other_user = User.objects.create(email="test9@test.ru", is_staff=True)
+        self.client.force_authenticate(user=other_user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ConditionalGetTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test10@test.ru", is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.module = Module.objects.create(title="Module", description="-")
+        self.course = Course.objects.create(
+            title="Course", description="-", module=self.module
+        )
+        self.lesson = Lesson.objects.create(
+            title="Lesson", description="-", course=self.course, owner=self.user
+        )
+
+    def test_updated_at_propagation(self):
+        """Тест обновления даты изменения курса и модуля при изменении урока."""
+
+        Course.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        Module.objects.update(updated_at=timezone.now() - timedelta(days=1))
+
+        self.lesson.title = "New title"
+        self.lesson.save()
+        self.course.refresh_from_db()
+        self.module.refresh_from_db()
+
+        self.assertGreaterEqual(self.course.updated_at, self.lesson.updated_at)
+        self.assertGreaterEqual(self.module.updated_at, self.lesson.updated_at)
+
+    def test_list_if_none_match(self):
+        """Тест ответа 304 на список без сериализации данных."""
+
+        response = self.client.get("/modules/")
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/modules/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(context.captured_queries), 0)
+
+        # После изменения данных версия ответа меняется.
+        self.lesson.save()
+        response = self.client.get("/modules/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_if_modified_since(self):
+        """Тест ответа 304 на просмотр урока по дате изменения."""
+
+        url = reverse("modules:lesson_retrieve", args=(self.lesson.pk,))
+        response = self.client.get(url)
+
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Lesson.objects.update(updated_at=timezone.now() + timedelta(days=1))
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CatalogChangesTestCase(APITestCase):
+
+    def setUp(self):
+        self.url = reverse("modules:catalog_changes")
+        self.module = Module.objects.create(title="Module", description="-")
+        self.cursor = self.client.get(self.url).data["cursor"]
+
+    def test_changes_since_cursor(self):
+        """Тест получения только изменений после курсора."""
+
+        course = Course.objects.create(
+            title="Course", description="-", module=self.module
+        )
+        course.title = "New title"
+        course.save()
+
+        response = self.client.get(self.url, {"since": self.cursor})
+        changes = {
+            (item["model"], item["id"]): item for item in response.data["changes"]
+        }
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(changes[("course", course.pk)]["data"]["title"], "New title")
+        # Счетчик курсов модуля изменился, поэтому модуль тоже в ленте.
+        self.assertIn(("module", self.module.pk), changes)
+
+        response = self.client.get(self.url, {"since": response.data["cursor"]})
+        self.assertEqual(response.data["changes"], [])
+
+    def test_tombstones(self):
+        """Тест записей об удалении объектов."""
+
+        lesson = Lesson.objects.create(title="Lesson", description="-")
+        lesson_id = lesson.pk
+        lesson.delete()
+
+        response = self.client.get(self.url, {"since": self.cursor})
+
+        self.assertEqual(
+            response.data["changes"][-1],
+            {
+                "seq": response.data["cursor"],
+                "model": "lesson",
+                "id": lesson_id,
+                "action": "deleted",
+                "data": None,
+            },
+        )
+
+    def test_changes_limit(self):
+        """Тест постраничного получения ленты изменений."""
+
+        for i in range(3):
+            Lesson.objects.create(title=f"Lesson {i}", description="-")
+
+        response = self.client.get(self.url, {"since": self.cursor, "limit": 2})
+
+        self.assertTrue(response.data["has_more"])
+        self.assertEqual(len(response.data["changes"]), 2)
+
+    def test_pruned_cursor_gone(self):
+        """Тест ответа 410 на курсор, удаленный по сроку хранения журнала."""
+
+        Lesson.objects.create(title="Lesson", description="-")
+        cursor = self.client.get(self.url, {"since": self.cursor}).data["cursor"]
+        CatalogChange.objects.filter(pk__lte=cursor).delete()
+
+        response = self.client.get(self.url, {"since": cursor})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertIn("since", response.data)
+        response = self.client.get(self.url, {"since": 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_params(self):
+        """Тест ответа 400 на отрицательный курсор и лимит меньше 1."""
+
+        for params in ({"limit": -5}, {"limit": 0}, {"since": -1}, {"since": "x"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), response.data)
+
+
+class CatalogChangesCommitOrderTestCase(APITransactionTestCase):
+    """Тесты ленты изменений при параллельных транзакциях."""
+
+    def setUp(self):
+        self.url = reverse("modules:catalog_changes")
+        # Независимое соединение с открытой транзакцией
+        self.other = connection.get_new_connection(connection.get_connection_params())
+        self.addCleanup(self.other.close)
+
+    def test_late_commit_not_skipped(self):
+        """Тест изменения с меньшим номером, зафиксированного позже читателя."""
+
+        with self.other.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO modules_catalogchange "
+                "(model, object_id, action, changed_at, txid) VALUES "
+                "('lesson', 1, 'deleted', now(), pg_current_xact_id()::text::bigint) "
+                "RETURNING id"
+            )
+            (late_seq,) = cursor.fetchone()
+        module = Module.objects.create(title="Module", description="-")
+
+        # Изменение модуля зафиксировано, но раньше его начата транзакция,
+        # которая еще может зафиксировать изменение с меньшим номером
+        response = self.client.get(self.url, {"since": 0})
+        self.assertEqual(response.data["changes"], [])
+        self.assertEqual(response.data["cursor"], 0)
+
+        self.other.commit()
+        response = self.client.get(self.url, {"since": 0, "limit": 1})
+        self.assertEqual(response.data["changes"][0]["seq"], late_seq)
+        response = self.client.get(self.url, {"since": response.data["cursor"]})
+        self.assertEqual(
+            [(item["model"], item["id"]) for item in response.data["changes"]],
+            [("module", module.pk)],
+        )
+
+    def test_held_back_changes_logged(self):
+        """Тест предупреждения о журнале, задержанном долгой транзакцией."""
+
+        # Транзакция начата и не завершена: изменения, зафиксированные
+        # после ее начала, не выдаются
+        with self.other.cursor() as cursor:
+            cursor.execute("SELECT pg_current_xact_id()")
+        Module.objects.create(title="Module", description="-")
+        CatalogChange.objects.update(changed_at=timezone.now() - timedelta(days=1))
+
+        with self.assertLogs("modules.tasks", "WARNING") as logs:
+            send_digest()
+        self.assertIn("долгой транзакцией", logs.output[0])
+        self.other.rollback()
+        with self.assertNoLogs("modules.tasks", "WARNING"):
+            send_digest()
+
+    def test_digest_waits_for_late_commit(self):
+        """Тест сводки, не пропускающей изменение, зафиксированное позже."""
+
+        modules = [
+            Module.objects.create(title=f"Модуль {i}", description="-")
+            for i in range(2)
+        ]
+        user = User.objects.create(email="late@test.ru")
+        for module in modules:
+            Subscription.objects.create(subscriber=user, module=module)
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", eager)
+        self.assertEqual(send_digest(), 0)
+
+        with self.other.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO modules_catalogchange "
+                "(model, object_id, action, changed_at, txid) VALUES "
+                "('module', %s, 'updated', now(), pg_current_xact_id()::text::bigint)",
+                [modules[0].pk],
+            )
+        modules[1].description = "Новое описание"
+        modules[1].save()
+
+        self.assertEqual(send_digest(), 0)
+        self.other.commit()
+        self.assertEqual(send_digest(), 1)
+        self.assertIn("'Модуль 0'", mail.outbox[0].body)
+        self.assertIn("'Модуль 1'", mail.outbox[0].body)
+
+
+class ModuleTreeParityTestCase(APITestCase):
+    """
+    Тесты совпадения ответов сериализаторов, SQL-пути и снимков
+    для дерева модулей.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test11@test.ru", is_staff=True)
+        other_user = User.objects.create(email="test12@test.ru")
+        self.module = Module.objects.create(
+            title="Модуль", description="Описание \"в кавычках\"\n", owner=self.user
+        )
+        Module.objects.create(title="Пустой модуль", description="-")
+        for i in range(2):
+            course = Course.objects.create(
+                title=f"Course {i}",
+                description="-",
+                module=self.module,
+                preview="course_preview/image.png" if i else "",
+            )
+            Lesson.objects.create(
+                title="Lesson",
+                description="-",
+                course=course,
+                video="https://www.youtube.com/watch/1",
+                preview="lesson_preview/image.png",
+                owner=self.user,
+            )
+            Subscription.objects.create(
+                subscriber=other_user, course=course, subscription_type="course"
+            )
+        Subscription.objects.create(subscriber=self.user, module=self.module)
+        # Дата без микросекунд форматируется отдельно.
+        Lesson.objects.filter(course__title="Course 0").update(
+            updated_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        )
+
+    def assert_parity(self, url, **params):
+        """
+        Проверяет, что все способы построения дерева дают одинаковый ответ,
+        и возвращает этот ответ.
+        """
+
+        responses = {}
+        for renderer in ("orm", "sql", "snapshot"):
+            cache.clear()
+            with self.settings(MODULES_TREE_RENDERER=renderer):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            responses[renderer] = json.loads(response.content)
+        self.assertEqual(responses["orm"], responses["sql"])
+        self.assertEqual(responses["orm"], responses["snapshot"])
+        return responses["orm"]
+
+    def test_list_parity_anonymous(self):
+        """Тест совпадения списка модулей для анонимного пользователя."""
+
+        self.assert_parity("/modules/")
+
+    def test_list_parity_authenticated(self):
+        """Тест совпадения списка модулей с признаком подписки пользователя."""
+
+        self.client.force_authenticate(user=self.user)
+        data = self.assert_parity("/modules/", pagination="cursor")
+        self.assertTrue(data["results"][0]["is_subscribed"])
+
+    def test_retrieve_parity(self):
+        """Тест совпадения детального просмотра модуля."""
+
+        self.client.force_authenticate(user=self.user)
+        self.assert_parity(f"/modules/{self.module.pk}/")
+
+    def test_sql_single_query(self):
+        """Тест построения страницы модулей одним запросом дерева."""
+
+        with self.settings(MODULES_TREE_RENDERER="sql"):
+            with CaptureQueriesContext(connection) as context:
+                self.client.get("/modules/")
+
+        # Запрос количества, запрос идентификаторов страницы и запрос дерева.
+        self.assertEqual(len(context.captured_queries), 3)
+
+
+@override_settings(MODULES_TREE_RENDERER="snapshot")
+class ModuleSnapshotTestCase(APITestCase):
+    """Тесты выдачи дерева модулей из JSON-снимков."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test13@test.ru", is_staff=True)
+        self.module = Module.objects.create(
+            title="Модуль", description="-", owner=self.user
+        )
+        self.course = Course.objects.create(
+            title="Курс", description="-", module=self.module
+        )
+        Subscription.objects.create(
+            subscriber=self.user, course=self.course, subscription_type="course"
+        )
+
+    def get_modules(self):
+        cache.clear()
+        response = self.client.get("/modules/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content)["results"]
+
+    def test_snapshot_built_on_read(self):
+        """Тест построения снимка при первом чтении и выдачи без сериализации."""
+
+        self.get_modules()
+        self.assertTrue(ModuleSnapshot.objects.filter(module=self.module).exists())
+
+        with patch.object(ModuleSerializer, "to_representation") as serialize:
+            self.get_modules()
+        serialize.assert_not_called()
+
+    def test_user_fields_overlay(self):
+        """Тест подстановки признаков подписки одним запросом."""
+
+        self.get_modules()
+        with CaptureQueriesContext(connection) as context:
+            data = self.get_modules()[0]
+        self.assertFalse(data["is_subscribed"])
+        self.assertFalse(data["course"][0]["is_subscribed"])
+        self.assertFalse(
+            any("modules_subscription" in q["sql"] for q in context.captured_queries)
+        )
+
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as context:
+            data = self.get_modules()[0]
+        self.assertFalse(data["is_subscribed"])
+        self.assertTrue(data["course"][0]["is_subscribed"])
+        subscription_queries = [
+            query
+            for query in context.captured_queries
+            if "modules_subscription" in query["sql"]
+        ]
+        self.assertEqual(len(subscription_queries), 1)
+
+        response = self.client.get(f"/modules/{self.module.pk}/")
+        self.assertTrue(json.loads(response.content)["course"][0]["is_subscribed"])
+
+    def test_snapshot_rebuilt_on_write(self):
+        """Тест перестроения снимка задачей Celery после изменения урока."""
+
+        self.get_modules()
+        with patch("modules.tasks.rebuild_module_snapshots.apply_async") as publish:
+            Lesson.objects.create(
+                title="Новый урок", description="-", course=self.course
+            )
+            # Задача публикуется из outbox, а не в транзакции записи
+            publish.assert_not_called()
+            relay_outbox()
+        publish.assert_called_once_with(([self.module.pk],), producer=ANY)
+        self.assertFalse(ModuleSnapshot.objects.filter(module=self.module).exists())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+        rebuild_module_snapshots(*publish.call_args.args[0])
+        snapshot = ModuleSnapshot.objects.get(module=self.module)
+        self.assertIn("Новый урок", snapshot.data)
+        lessons = self.get_modules()[0]["course"][0]["lesson"]
+        self.assertEqual(lessons[0]["title"], "Новый урок")
+
+    def test_stale_snapshot_not_served(self):
+        """Тест перестроения снимка, построенного до изменения модуля."""
+
+        self.get_modules()
+        # Изменение в обход сигналов: снимок не удален, но устарел
+        Module.objects.filter(pk=self.module.pk).update(
+            title="Новый модуль", updated_at=timezone.now()
+        )
+        self.assertEqual(self.get_modules()[0]["title"], "Новый модуль")
+        self.assertIn(
+            "Новый модуль", ModuleSnapshot.objects.get(module=self.module).data
+        )
+
+    def test_newer_snapshot_not_overwritten(self):
+        """Тест сохранения снимка, построенного по более новым данным."""
+
+        ModuleSnapshot.objects.create(
+            module=self.module,
+            data="{}",
+            module_updated_at=self.module.updated_at + timedelta(seconds=1),
+        )
+        build_snapshots([self.module.pk])
+        self.assertEqual(ModuleSnapshot.objects.get(module=self.module).data, "{}")
+
+
+class SubscriptionLoaderTestCase(APITestCase):
+    """Тесты пакетной проверки подписок пользователя (is_subscribed)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test14@test.ru", is_staff=True)
+        for i in range(3):
+            module = Module.objects.create(
+                title=f"Module {i}", description="-", owner=self.user
+            )
+            for j in range(2):
+                course = Course.objects.create(
+                    title=f"Course {j}", description="-", module=module
+                )
+                if i == j:
+                    Subscription.objects.create(
+                        subscriber=self.user,
+                        course=course,
+                        subscription_type="course",
+                    )
+        self.module = Module.objects.first()
+        Subscription.objects.create(subscriber=self.user, module=self.module)
+
+    def get_subscriber_queries(self, url):
+        """Возвращает ответ и запросы подписок конкретного пользователя."""
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        queries = [
+            query
+            for query in context.captured_queries
+            if '"subscriber_id" =' in query["sql"]
+        ]
+        return response, queries
+
+    def test_anonymous_without_queries(self):
+        """Тест отсутствия запросов подписок для анонимного пользователя."""
+
+        response, queries = self.get_subscriber_queries("/modules/")
+        self.assertEqual(queries, [])
+        self.assertFalse(response.data["results"][0]["is_subscribed"])
+
+    def test_module_list_single_query(self):
+        """Тест проверки подписок на модули и курсы одним запросом."""
+
+        self.client.force_authenticate(user=self.user)
+        response, queries = self.get_subscriber_queries("/modules/")
+        self.assertEqual(len(queries), 1)
+        subscribed = [
+            [module["is_subscribed"]]
+            + [course["is_subscribed"] for course in module["course"]]
+            for module in response.data["results"]
+        ]
+        self.assertEqual(
+            subscribed,
+            [[True, True, False], [False, False, True], [False, False, False]],
+        )
+
+    def test_module_retrieve_single_query(self):
+        """Тест проверки подписок при детальном просмотре модуля."""
+
+        self.client.force_authenticate(user=self.user)
+        response, queries = self.get_subscriber_queries(
+            f"/modules/{self.module.pk}/"
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(response.data["is_subscribed"])
+        self.assertTrue(response.data["course"][0]["is_subscribed"])
+
+    def test_course_list_single_query(self):
+        """Тест проверки подписок на курсы одним запросом."""
+
+        self.client.force_authenticate(user=self.user)
+        response, queries = self.get_subscriber_queries(
+            reverse("modules:course_list") + "?page_size=10"
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            [course["is_subscribed"] for course in response.data["results"]],
+            [True, False, False, True, False, False],
+        )
+
+
+class SubscriberListTestCase(APITestCase):
+    """Тесты вывода подписчиков модуля и курса отдельными списками."""
+
+    def setUp(self):
+        cache.clear()
+        self.module = Module.objects.create(title="Модуль", description="-")
+        self.course = Course.objects.create(
+            title="Курс", description="-", module=self.module
+        )
+        for i in range(7):
+            user = User.objects.create(email=f"subscriber{i}@test.ru")
+            Subscription.objects.create(subscriber=user, module=self.module)
+            Subscription.objects.create(
+                subscriber=user, course=self.course, subscription_type="course"
+            )
+
+    def collect_pages(self, url):
+        """Обходит все страницы списка по ссылкам next."""
+
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_module_without_embedded_subscribers(self):
+        """Тест вывода только количества подписчиков в модуле и курсе."""
+
+        module_data = self.client.get("/modules/").data["results"][0]
+        self.assertNotIn("subscribers", module_data)
+        self.assertNotIn("subscribers", module_data["course"][0])
+        self.assertEqual(module_data["subscribers_count"], 7)
+        self.assertEqual(module_data["course"][0]["subscribers_count"], 7)
+
+    def test_module_subscribers(self):
+        """Тест keyset-пагинации подписчиков модуля без подсчета COUNT(*)."""
+
+        url = f"/modules/{self.module.pk}/subscribers/"
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertNotIn("count", response.data)
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in context.captured_queries)
+        )
+
+        expected = list(
+            Subscription.objects.filter(module=self.module)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        self.assertEqual(self.collect_pages(url), expected)
+
+    def test_course_subscribers(self):
+        """Тест keyset-пагинации подписчиков курса."""
+
+        url = reverse("modules:course_subscribers", args=[self.course.pk])
+        expected = list(
+            Subscription.objects.filter(course=self.course)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        self.assertEqual(self.collect_pages(url), expected)
+
+    def test_subscribers_not_found(self):
+        """Тест ответа 404 для несуществующего модуля или курса."""
+
+        response = self.client.get("/modules/0/subscribers/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse("modules:course_subscribers", args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SubscriptionToggleTestCase(APITestCase):
+    """Тесты атомарного переключения подписки на модуль и его курсы."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test15@test.ru", is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.module = Module.objects.create(title="Модуль", description="-")
+        self.courses = [
+            Course.objects.create(
+                title=f"Курс {i}", description="-", module=self.module
+            )
+            for i in range(3)
+        ]
+        self.url = reverse("modules:subscription_create")
+
+    def toggle(self):
+        # Роли пользователя уже в кэше: запрос переключения - единственный.
+        # Подписки, счетчики, даты изменения и снимок меняются в нем же.
+        load_roles(self.user)
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, data={"module": self.module.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_toggle_module_and_courses(self):
+        """Тест подписки на модуль и все его курсы и последующей отписки."""
+
+        response = self.toggle()
+        self.assertEqual(
+            response.data["message"],
+            {
+                "module": "Подписка на модуль добавлена",
+                "course": "Подписка на курсы модуля добавлена",
+            },
+        )
+        self.assertEqual(Subscription.objects.filter(subscriber=self.user).count(), 4)
+        self.module.refresh_from_db()
+        self.assertEqual(self.module.subscribers_count, 1)
+        self.assertEqual(
+            list(Course.objects.values_list("subscribers_count", flat=True)),
+            [1, 1, 1],
+        )
+
+        response = self.toggle()
+        self.assertEqual(
+            response.data["message"]["module"], "Подписка на модуль удалена"
+        )
+        self.assertFalse(Subscription.objects.filter(subscriber=self.user).exists())
+        self.module.refresh_from_db()
+        self.assertEqual(self.module.subscribers_count, 0)
+        self.assertEqual(
+            list(Course.objects.values_list("subscribers_count", flat=True)),
+            [0, 0, 0],
+        )
+
+    def test_existing_course_subscription_kept(self):
+        """Тест отсутствия дублей при уже существующей подписке на курс."""
+
+        Subscription.objects.create(
+            subscriber=self.user, course=self.courses[0], subscription_type="course"
+        )
+        self.toggle()
+        self.assertEqual(
+            Subscription.objects.filter(
+                subscriber=self.user, course=self.courses[0]
+            ).count(),
+            1,
+        )
+        self.assertEqual(
+            list(Course.objects.values_list("subscribers_count", flat=True)),
+            [1, 1, 1],
+        )
+
+        # Отписка от модуля не удаляет отдельную подписку на курс
+        self.toggle()
+        self.assertEqual(
+            list(
+                Subscription.objects.filter(subscriber=self.user).values_list(
+                    "course", flat=True
+                )
+            ),
+            [self.courses[0].pk],
+        )
+        self.assertEqual(
+            list(
+                Course.objects.order_by("pk").values_list(
+                    "subscribers_count", flat=True
+                )
+            ),
+            [1, 0, 0],
+        )
+
+    def test_toggle_updates_module(self):
+        """Тест даты изменения и снимка модуля без записи в журнал изменений."""
+
+        ModuleSnapshot.objects.create(module=self.module, data="{}")
+        updated_at = Module.objects.get().updated_at
+        changes = CatalogChange.objects.count()
+        self.toggle()
+        self.assertGreater(Module.objects.get().updated_at, updated_at)
+        self.assertFalse(ModuleSnapshot.objects.exists())
+        self.assertEqual(CatalogChange.objects.count(), changes)
+
+    @override_settings(MODULES_TREE_RENDERER="snapshot")
+    def test_toggle_schedules_snapshot_rebuild(self):
+        """Тест события перестроения снимка в запросе переключения подписки."""
+
+        self.toggle()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.event_type, "snapshots_rebuild")
+        self.assertEqual(event.payload, {"module_ids": [self.module.pk]})
+
+    def test_unique_constraint(self):
+        """Тест запрета повторной подписки на уровне БД."""
+
+        Subscription.objects.create(subscriber=self.user, module=self.module)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Subscription.objects.create(subscriber=self.user, module=self.module)
+
+    def test_toggle_missing_module(self):
+        """Тест ответа 404 для несуществующего модуля."""
+
+        response = self.client.post(self.url, data={"module": 0})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Subscription.objects.exists())
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN-план PostgreSQL")
+class SubscriptionIndexTestCase(APITestCase):
+    """
+    Тесты использования индексов запросами к подпискам. Последовательное
+    сканирование запрещается, поэтому оно останется в плане, только если
+    подходящего индекса нет.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email="test16@test.ru")
+        self.module = Module.objects.create(title="Модуль", description="-")
+        self.course = Course.objects.create(
+            title="Курс", description="-", module=self.module
+        )
+        Subscription.objects.create(subscriber=self.user, module=self.module)
+        Subscription.objects.create(subscriber=self.user, course=self.course)
+
+    def assert_index_scan(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan, plan)
+
+    def test_module_subscribers(self):
+        """Тест выборки подписчиков модуля для рассылки."""
+
+        self.assert_index_scan(
+            Subscription.objects.filter(module=self.module).values_list(
+                "subscriber_id", flat=True
+            )
+        )
+
+    def test_user_subscriptions(self):
+        """Тест проверки подписок пользователя (is_subscribed)."""
+
+        self.assert_index_scan(
+            Subscription.objects.filter(
+                Q(module_id__in=[self.module.pk]) | Q(course_id__in=[self.course.pk]),
+                subscriber=self.user,
+            ).values_list("module_id", "course_id")
+        )
+        self.assert_index_scan(Subscription.objects.filter(subscriber=self.user))
+
+    def test_subscribers_keyset(self):
+        """Тест keyset-пагинации подписчиков модуля и курса."""
+
+        self.assert_index_scan(
+            Subscription.objects.filter(module=self.module, pk__gt=0).order_by("pk")
+        )
+        self.assert_index_scan(
+            Subscription.objects.filter(course=self.course, pk__gt=0).order_by("pk")
+        )
+
+    def test_no_redundant_indexes(self):
+        """Тест отсутствия индексов, колонки которых - начало другого индекса."""
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Subscription._meta.db_table
+            )
+        indexes = {
+            name: tuple(item["columns"])
+            for name, item in constraints.items()
+            if item["index"] and not item["primary_key"]
+        }
+        for name, columns in indexes.items():
+            for other, other_columns in indexes.items():
+                if other != name:
+                    self.assertNotEqual(
+                        other_columns[: len(columns)], columns, (name, other)
+                    )
+
+    def test_subscription_type_constraint(self):
+        """Тест соответствия типа подписки заполненной ссылке."""
+
+        subscription = Subscription.objects.get(course=self.course)
+        self.assertEqual(subscription.subscription_type, "course")
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Subscription.objects.filter(pk=subscription.pk).update(
+                    subscription_type="module"
+                )
+
+
+class SendUpdatesTestCase(APITestCase):
+    """Тесты рассылки уведомлений об обновлении модуля пачками."""
+
+    def setUp(self):
+        self.module = Module.objects.create(title="Модуль", description="-")
+        for i in range(7):
+            user = User.objects.create(email=f"reader{i}@test.ru")
+            Subscription.objects.create(subscriber=user, module=self.module)
+
+    @override_settings(NOTIFICATION_CHUNK_SIZE=3)
+    def test_chunks_share_connection(self):
+        """Тест отправки писем пачками, по одному соединению на пачку."""
+
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", eager)
+
+        with patch(
+            "modules.deliveries.get_connection", wraps=get_connection
+        ) as connections:
+            send_updates(self.module.pk)
+
+        self.assertEqual(connections.call_count, 3)
+        self.assertEqual(len(mail.outbox), 7)
+        self.assertEqual(
+            {message.to[0] for message in mail.outbox},
+            {f"reader{i}@test.ru" for i in range(7)},
+        )
+        self.assertEqual(mail.outbox[0].subject, "Обновление модуля: 'Модуль'")
+
+    def test_missing_module(self):
+        """Тест отсутствия рассылки для удаленного модуля."""
+
+        send_updates(0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_benchmark_command(self):
+        """Тест замера пропускной способности на SMTP-заглушке."""
+
+        out = StringIO()
+        call_command(
+            "benchmark_emails", count=3, chunk_size=2, concurrency=2, stdout=out
+        )
+        self.assertIn("per-message: 3 писем", out.getvalue())
+        self.assertIn("chunked: 3 писем", out.getvalue())
+        self.assertIn("green x2: 3 писем", out.getvalue())
+        self.assertFalse(Delivery.objects.exists())
+        self.assertFalse(User.objects.filter(email__startswith="benchmark").exists())
+
+    def test_email_queue_routing(self):
+        """Тест маршрутизации задач отправки писем в очередь email."""
+
+        for task in (send_update_emails, send_digest_emails):
+            route = celery_app.amqp.router.route({}, task.name)
+            self.assertEqual(route["queue"].name, "email")
+        route = celery_app.amqp.router.route({}, send_updates.name)
+        self.assertEqual(route["queue"].name, "celery")
+
+    def test_eventlet_worker_patches_psycopg(self):
+        """Тест неблокирующих запросов к базе только в воркере eventlet."""
+
+        for pool, patched in (("prefork", False), ("eventlet", True)):
+            with patch("psycogreen.eventlet.patch_psycopg") as patch_psycopg:
+                patch_psycopg_for_eventlet(sender=Mock(pool_cls=pool))
+            self.assertEqual(patch_psycopg.called, patched)
+
+
+@override_settings(NOTIFICATION_MODE="immediate")
+class UpdateNotificationDebounceTestCase(APITestCase):
+    """Тесты объединения уведомлений о частых изменениях модуля."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test17@test.ru", is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.module = Module.objects.create(
+            title="Модуль", description="-", owner=self.user
+        )
+
+    def patch_module(self, description):
+        response = self.client.patch(
+            f"/modules/{self.module.pk}/", {"description": description}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(NOTIFICATION_DEBOUNCE=600)
+    def test_updates_coalesced(self):
+        """Тест одной отложенной рассылки на серию изменений модуля."""
+
+        with patch(
+            "modules.tasks.flush_update_notification.apply_async"
+        ) as apply_async:
+            for i in range(5):
+                self.patch_module(f"Описание {i}")
+                relay_outbox()
+        apply_async.assert_called_once_with(
+            (self.module.pk,), countdown=600, producer=ANY
+        )
+
+        with patch("modules.tasks.send_updates") as send:
+            flush_update_notification(self.module.pk)
+        send.assert_called_once_with(self.module.pk)
+
+        # После рассылки следующее изменение открывает новое окно
+        with patch(
+            "modules.tasks.flush_update_notification.apply_async"
+        ) as apply_async:
+            self.patch_module("Новое описание")
+            relay_outbox()
+        apply_async.assert_called_once()
+
+    def test_modules_debounced_separately(self):
+        """Тест независимых окон для разных модулей."""
+
+        other = Module.objects.create(title="Другой модуль", description="-")
+        with patch("modules.tasks.flush_update_notification.apply_async"):
+            self.assertTrue(schedule_update_notification(self.module.pk))
+            self.assertFalse(schedule_update_notification(self.module.pk))
+            self.assertTrue(schedule_update_notification(other.pk))
+
+
+@override_settings(NOTIFICATION_MODE="immediate")
+class OutboxTestCase(APITestCase):
+    """Тесты публикации событий об изменении модулей через outbox."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test18@test.ru", is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.modules = [
+            Module.objects.create(title=f"Модуль {i}", description="-", owner=self.user)
+            for i in range(2)
+        ]
+
+    def test_event_written_with_module(self):
+        """Тест записи события без обращения к брокеру в запросе."""
+
+        with patch("modules.tasks.flush_update_notification.apply_async") as publish:
+            response = self.client.patch(
+                f"/modules/{self.modules[0].pk}/", {"title": "Новый"}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        publish.assert_not_called()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.event_type, "module_updated")
+        self.assertEqual(event.payload, {"module_id": self.modules[0].pk})
+
+    def test_event_rolled_back_with_module(self):
+        """Тест отсутствия изменений модуля, если событие не записано."""
+
+        with patch.object(OutboxEvent.objects, "create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.patch(
+                    f"/modules/{self.modules[0].pk}/",
+                    {"title": "Новый"},
+                    format="json",
+                )
+        self.modules[0].refresh_from_db()
+        self.assertEqual(self.modules[0].title, "Модуль 0")
+
+    def test_relay_in_batches(self):
+        """Тест публикации событий пачками с объединением по модулю."""
+
+        for module in self.modules + self.modules + self.modules[:1]:
+            OutboxEvent.objects.create(
+                event_type="module_updated", payload={"module_id": module.pk}
+            )
+        with patch("modules.tasks.flush_update_notification.apply_async") as publish:
+            out = StringIO()
+            call_command("relay_outbox", batch_size=2, stdout=out)
+
+        self.assertIn("Опубликовано событий: 5", out.getvalue())
+        self.assertEqual(publish.call_count, 2)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_relay_broker_failure(self):
+        """Тест сохранения событий в outbox при недоступном брокере."""
+
+        OutboxEvent.objects.create(
+            event_type="module_updated", payload={"module_id": self.modules[0].pk}
+        )
+        with patch(
+            "modules.tasks.flush_update_notification.apply_async",
+            side_effect=ConnectionError,
+        ):
+            with self.assertRaises(ConnectionError):
+                relay_outbox()
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+        with patch("modules.tasks.flush_update_notification.apply_async") as publish:
+            self.assertEqual(relay_outbox(), 1)
+        publish.assert_called_once()
+
+
+class DigestTestCase(APITestCase):
+    """Тесты сводной рассылки об изменениях модулей."""
+
+    def setUp(self):
+        self.modules = [
+            Module.objects.create(title=f"Модуль {i}", description="-")
+            for i in range(3)
+        ]
+        self.users = [User.objects.create(email=f"digest{i}@test.ru") for i in range(2)]
+        for module in self.modules[:2]:
+            Subscription.objects.create(subscriber=self.users[0], module=module)
+        Subscription.objects.create(subscriber=self.users[1], module=self.modules[2])
+
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", eager)
+
+        # Первый запуск только запоминает конец журнала
+        self.assertEqual(send_digest(), 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_one_digest_per_subscriber(self):
+        """Тест одной сводки на подписчика по всем его измененным модулям."""
+
+        for module in self.modules[:2]:
+            module.description = "Новое описание"
+            module.save()
+        Course.objects.create(title="Курс", description="-", module=self.modules[1])
+
+        self.assertEqual(send_digest(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["digest0@test.ru"])
+        self.assertEqual(mail.outbox[0].subject, "Обновления модулей: 2")
+        self.assertIn("'Модуль 0'", mail.outbox[0].body)
+        self.assertIn("'Модуль 1'", mail.outbox[0].body)
+
+        # Уже разосланные изменения повторно не учитываются
+        self.assertEqual(send_digest(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(NOTIFICATION_MODE="digest")
+    def test_prune_digested_changes(self):
+        """Тест очистки журнала только до позиции сводки."""
+
+        position = NotificationCursor.objects.get(name="digest").position
+        self.modules[0].description = "Новое описание"
+        self.modules[0].save()
+        CatalogChange.objects.update(changed_at=timezone.now() - timedelta(days=60))
+        pending = set(
+            CatalogChange.objects.filter(pk__gt=position).values_list("pk", flat=True)
+        )
+
+        out = StringIO()
+        call_command("prune_catalog_changes", batch_size=2, stdout=out)
+        self.assertIn("Удалено записей журнала:", out.getvalue())
+        self.assertEqual(
+            set(CatalogChange.objects.values_list("pk", flat=True)),
+            {position} | pending,
+        )
+
+        # Неразосланные изменения попадают в сводку, затем удаляются
+        self.assertEqual(send_digest(), 1)
+        last = max(pending)
+        CatalogChange.objects.update(changed_at=timezone.now() - timedelta(days=60))
+        prune_catalog_changes()
+        self.assertEqual(
+            list(CatalogChange.objects.values_list("pk", flat=True)), [last]
+        )
+
+    def test_recent_changes_kept(self):
+        """Тест сохранения изменений моложе срока хранения журнала."""
+
+        self.modules[0].save()
+        self.assertEqual(send_digest(), 1)
+        count = CatalogChange.objects.count()
+        self.assertEqual(prune_catalog_changes(), 0)
+        self.assertEqual(CatalogChange.objects.count(), count)
+
+    def test_subscriptions_not_digested(self):
+        """Тест отсутствия сводки после подписки и отписки других пользователей."""
+
+        other = User.objects.create(email="digest-other@test.ru", is_staff=True)
+        Course.objects.create(title="Курс", description="-", module=self.modules[0])
+        self.assertEqual(send_digest(), 1)
+        mail.outbox.clear()
+
+        self.client.force_authenticate(user=other)
+        url = reverse("modules:subscription_create")
+        for _ in range(2):
+            response = self.client.post(url, data={"module": self.modules[0].pk})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        Subscription.objects.create(subscriber=other, module=self.modules[1])
+
+        self.assertEqual(send_digest(), 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_no_changes(self):
+        """Тест запуска без изменений: журнал читается без рассылки."""
+
+        position = NotificationCursor.objects.get().position
+        # Проверка задержанных изменений, конец журнала и позиция сводки
+        with self.assertNumQueries(5):
+            self.assertEqual(send_digest(), 0)
+        self.assertEqual(NotificationCursor.objects.get().position, position)
+
+    def test_broker_failure_keeps_position(self):
+        """Тест повторной рассылки изменений после ошибки брокера."""
+
+        self.modules[2].save()
+        position = NotificationCursor.objects.get().position
+        with patch("celery.group.apply_async", side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                send_digest()
+        self.assertEqual(NotificationCursor.objects.get().position, position)
+
+        self.assertEqual(send_digest(), 1)
+        self.assertEqual(mail.outbox[0].to, ["digest1@test.ru"])
+
+    def test_digest_mode_skips_outbox(self):
+        """Тест отсутствия событий outbox в режиме сводки."""
+
+        owner = User.objects.create(email="digest-owner@test.ru", is_staff=True)
+        Module.objects.filter(pk=self.modules[0].pk).update(owner=owner)
+        self.client.force_authenticate(user=owner)
+        with override_settings(NOTIFICATION_MODE="digest"):
+            response = self.client.patch(
+                f"/modules/{self.modules[0].pk}/", {"title": "Новый"}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(send_digest(), 1)
+
+
+class DeliveryLedgerTestCase(APITestCase):
+    """Тесты журнала доставки писем рассылки."""
+
+    def setUp(self):
+        self.module = Module.objects.create(title="Модуль", description="-")
+        for i in range(5):
+            user = User.objects.create(email=f"ledger{i}@test.ru")
+            Subscription.objects.create(subscriber=user, module=self.module)
+
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", eager)
+
+    def test_deliveries_marked_sent(self):
+        """Тест отметки отправленных писем в журнале."""
+
+        notification_id = send_updates(self.module.pk)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(
+            Delivery.objects.filter(
+                notification_id=notification_id, status="sent"
+            ).count(),
+            5,
+        )
+        self.assertEqual(resume_notification(notification_id), 0)
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(NOTIFICATION_CHECKPOINT_SIZE=2)
+    def test_resume_after_failure(self):
+        """Тест повтора рассылки только для неотправленных писем."""
+
+        sent = []
+
+        def fail_third_batch(subject, message, recipients, connection=None):
+            if len(sent) == 4:
+                raise ConnectionError
+            sent.extend(recipients)
+            return len(recipients)
+
+        # Все повторы пачки неудачны: письма пачки освобождаются для resume
+        with patch(
+            "modules.deliveries.send_messages", side_effect=fail_third_batch
+        ) as send_messages:
+            send_updates(self.module.pk)
+        self.assertEqual(send_messages.call_count, 3 + send_update_emails.max_retries)
+        self.assertEqual(len(sent), 4)
+        self.assertFalse(Delivery.objects.filter(claim__isnull=False, status="pending"))
+        self.assertEqual(Delivery.objects.filter(status="sent").count(), 4)
+
+        out = StringIO()
+        notification_id = Delivery.objects.values_list(
+            "notification_id", flat=True
+        ).first()
+        call_command("notification_progress", notification_id, resume=True, stdout=out)
+        self.assertIn("отправлено 4 из 5", out.getvalue())
+        self.assertIn("поставлено в очередь: 1", out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertNotIn(mail.outbox[0].to[0], sent)
+        self.assertFalse(Delivery.objects.filter(status="pending").exists())
+
+    def test_resume_skips_claimed(self):
+        """Тест пропуска писем, закрепленных за отправляемой пачкой."""
+
+        notification = Notification.objects.create(
+            module=self.module, subject="-", message="-"
+        )
+        create_deliveries(notification)
+        subscriber_ids = list(
+            Delivery.objects.order_by("subscriber_id").values_list(
+                "subscriber_id", flat=True
+            )
+        )
+        claim, count = claim_deliveries(notification.pk, subscriber_ids[:2])
+        self.assertEqual(count, 2)
+
+        self.assertEqual(resume_notification(notification.pk), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(resume_notification(notification.pk), 0)
+
+        # Аренда истекла: письма закрепляются за новой пачкой,
+        # а задача прежней пачки ничего не отправляет
+        Delivery.objects.filter(claim=claim).update(
+            claimed_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(resume_notification(notification.pk), 2)
+        self.assertEqual(deliver(notification.pk, claim), 0)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(Delivery.objects.filter(status="pending").exists())
+
+    def test_retry_after_smtp_error(self):
+        """Тест повтора пачки после ошибки SMTP без повторной отправки писем."""
+
+        sent = []
+
+        def fail_once(subject, message, recipients, connection=None):
+            if len(sent) == 2 and fail_once.failed is False:
+                fail_once.failed = True
+                raise ConnectionError
+            sent.extend(recipients)
+            return len(recipients)
+
+        fail_once.failed = False
+        with override_settings(NOTIFICATION_CHECKPOINT_SIZE=2), patch(
+            "modules.deliveries.send_messages", side_effect=fail_once
+        ):
+            send_updates(self.module.pk)
+        self.assertTrue(fail_once.failed)
+        self.assertEqual(len(sent), 5)
+        self.assertEqual(len(set(sent)), 5)
+        self.assertFalse(Delivery.objects.filter(status="pending").exists())
+
+    def test_email_task_acks_late(self):
+        """Тест подтверждения задач отправки писем после выполнения."""
+
+        for task in (send_update_emails, send_digest_emails):
+            self.assertTrue(task.acks_late)
+            self.assertTrue(task.reject_on_worker_lost)
+            self.assertEqual(task.max_retries, 5)
+            self.assertEqual(task.autoretry_for, (OSError,))
+
+    def test_digest_retry_after_smtp_error(self):
+        """Тест повтора пачки сводок после ошибки SMTP."""
+
+        digests = [(f"ledger{i}@test.ru", ("Тема", "Текст")) for i in range(2)]
+        with patch(
+            "modules.tasks.send_personal_messages",
+            side_effect=[ConnectionError, 2],
+        ) as send:
+            send_digest_emails.delay(digests)
+        self.assertEqual(send.call_count, 2)
+
+
+class OwnerFilterTestCase(APITestCase):
+    """Тесты фильтрации списков по владельцу (?owner=)."""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create(email=f"owner{i}@test.ru") for i in range(2)]
+        for user in self.users:
+            module = Module.objects.create(
+                title=user.email, description="-", owner=user
+            )
+            course = Course.objects.create(
+                title=user.email, description="-", module=module, owner=user
+            )
+            Lesson.objects.create(
+                title=user.email, description="-", course=course, owner=user
+            )
+            Subscription.objects.create(subscriber=user, module=module)
+
+    def get_titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item.get("title") for item in response.json()["results"]]
+
+    def test_own_objects(self):
+        """Тест выборки объектов текущего пользователя."""
+
+        self.client.force_authenticate(user=self.users[0])
+        for url in ("/modules/", "/course/", "/lesson/"):
+            self.assertEqual(self.get_titles(f"{url}?owner=me"), ["owner0@test.ru"])
+        response = self.client.get("/subscription/?owner=me")
+        self.assertEqual(
+            [item["subscriber"] for item in response.json()],
+            [self.users[0].pk],
+        )
+
+    def test_owner_id(self):
+        """Тест выборки объектов указанного владельца."""
+
+        self.assertEqual(
+            self.get_titles(f"/modules/?owner={self.users[1].pk}"), ["owner1@test.ru"]
+        )
+        self.assertEqual(self.get_titles("/modules/?owner=me"), [])
+        response = self.client.get("/modules/?owner=abc")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_own_objects_cached_per_user(self):
+        """Тест раздельного кэша ответов ?owner=me для разных пользователей."""
+
+        for user in self.users:
+            self.client.force_authenticate(user=user)
+            self.assertEqual(self.get_titles("/lesson/?owner=me"), [user.email])
+
+    def test_owner_index(self):
+        """Тест выборки объектов владельца по индексу."""
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for model in (Module, Course, Lesson):
+            queryset = model.objects.filter(owner_id=self.users[0].pk).order_by("pk")
+            plan = queryset.explain()
+            self.assertNotIn("Seq Scan", plan, plan)
+        plan = (
+            Subscription.objects.filter(subscriber_id=self.users[0].pk)
+            .order_by("pk")
+            .explain()
+        )
+        self.assertNotIn("Seq Scan", plan, plan)
+
+
+class BulkWriteTestCase(APITestCase):
+    """Тесты массового создания и изменения курсов и уроков."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="bulk@test.ru", is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.module = Module.objects.create(
+            title="Модуль", description="-", owner=self.user
+        )
+        self.courses = [
+            Course.objects.create(
+                title=f"Курс {i}", description="-", module=self.module, owner=self.user
+            )
+            for i in range(2)
+        ]
+
+    def lesson_data(self, count, course):
+        return [
+            {
+                "title": f"Урок {i}",
+                "description": "-",
+                "course": course.pk,
+                "video": "https://www.youtube.com/watch?v=1",
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_lessons(self):
+        """Тест импорта уроков фиксированным числом запросов."""
+
+        data = self.lesson_data(200, self.courses[0])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/lesson/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()), 200)
+        self.assertLess(len(queries), 20)
+
+        lessons = Lesson.objects.filter(course=self.courses[0])
+        self.assertEqual(lessons.count(), 200)
+        self.assertFalse(lessons.exclude(owner=self.user).exists())
+        self.courses[0].refresh_from_db()
+        self.assertEqual(self.courses[0].lessons_in_course_count, 200)
+        self.assertEqual(
+            CatalogChange.objects.filter(model="lesson", action="created").count(),
+            200,
+        )
+        self.assertTrue(
+            CatalogChange.objects.filter(
+                model="module", object_id=self.module.pk, action="updated"
+            ).exists()
+        )
+
+    def test_bulk_create_errors_per_item(self):
+        """Тест ошибок по элементам без частичного сохранения."""
+
+        data = self.lesson_data(3, self.courses[0])
+        data[1]["video"] = "https://example.com/video"
+        data[2]["course"] = 0
+        response = self.client.post("/lesson/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn("non_field_errors", errors[1])
+        self.assertIn("course", errors[2])
+        self.assertFalse(Lesson.objects.exists())
+
+    def test_bulk_create_courses(self):
+        """Тест массового создания курсов модуля."""
+
+        data = [
+            {"title": f"Новый курс {i}", "description": "-", "module": self.module.pk}
+            for i in range(3)
+        ]
+        response = self.client.post("/course/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [course["title"] for course in response.json()],
+            [item["title"] for item in data],
+        )
+        self.module.refresh_from_db()
+        self.assertEqual(self.module.courses_in_module_count, 5)
+
+    def test_bulk_update_lessons(self):
+        """Тест массового изменения и переноса уроков между курсами."""
+
+        self.client.post(
+            "/lesson/bulk/", self.lesson_data(3, self.courses[0]), format="json"
+        )
+        lessons = list(Lesson.objects.order_by("pk"))
+        data = [
+            {"id": lessons[0].pk, "title": "Измененный урок"},
+            {"id": lessons[1].pk, "course": self.courses[1].pk},
+        ]
+        response = self.client.patch("/lesson/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        lessons[0].refresh_from_db()
+        self.assertEqual(lessons[0].title, "Измененный урок")
+        self.assertGreater(lessons[0].updated_at, lessons[2].updated_at)
+        for course, count in zip(self.courses, (2, 1)):
+            course.refresh_from_db()
+            self.assertEqual(course.lessons_in_course_count, count)
+
+    def test_bulk_update_foreign_objects(self):
+        """Тест запрета изменения чужих объектов с ошибкой по элементу."""
+
+        other = User.objects.create(email="bulk-other@test.ru")
+        course = Course.objects.create(
+            title="Чужой курс", description="-", module=self.module, owner=other
+        )
+        data = [
+            {"id": self.courses[0].pk, "title": "Свой"},
+            {"id": course.pk, "title": "Чужой"},
+        ]
+        response = self.client.patch("/course/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn("id", response.json()[1])
+        course.refresh_from_db()
+        self.assertEqual(course.title, "Чужой курс")
+
+
+class CatalogImportExportTestCase(APITestCase):
+    """Тесты выгрузки и загрузки каталога командами export_catalog/import_catalog."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.user = User.objects.create(email="catalog@test.ru")
+        self.module = Module.objects.create(
+            title="Модуль\tс табуляцией \\n",
+            description='Две\nстроки "в кавычках"',
+            owner=self.user,
+        )
+        self.course = Course.objects.create(
+            title="Курс", description="", module=self.module, owner=self.user
+        )
+        self.lesson = Lesson.objects.create(
+            title="Урок", description="-", course=self.course, owner=self.user
+        )
+        Subscription.objects.create(subscriber=self.user, module=self.module)
+        Subscription.objects.create(subscriber=self.user, course=self.course)
+
+    def roundtrip(self, path, *options):
+        out = StringIO()
+        call_command("export_catalog", path, *options, stdout=out)
+        self.assertIn("subscription: 2 строк", out.getvalue())
+        out = StringIO()
+        call_command("import_catalog", path, *options, stdout=out)
+        return out.getvalue()
+
+    def assert_imported(self):
+        module = Module.objects.exclude(pk=self.module.pk).get()
+        self.assertEqual(module.title, self.module.title)
+        self.assertEqual(module.description, self.module.description)
+        self.assertEqual(module.owner, self.user)
+        self.assertEqual(module.courses_in_module_count, 1)
+        self.assertEqual(module.subscribers_count, 1)
+
+        course = Course.objects.get(module=module)
+        self.assertNotEqual(course.pk, self.course.pk)
+        self.assertEqual(course.description, "")
+        self.assertEqual(course.lessons_in_course_count, 1)
+        self.assertEqual(course.subscribers_count, 1)
+
+        lesson = Lesson.objects.get(course=course)
+        self.assertIsNone(lesson.video)
+        self.assertEqual(lesson.updated_at, self.lesson.updated_at)
+        self.assertTrue(
+            CatalogChange.objects.filter(
+                model="lesson", object_id=lesson.pk, action="created"
+            ).exists()
+        )
+
+    def test_ndjson_roundtrip(self):
+        """Тест выгрузки и загрузки NDJSON с переназначением ссылок."""
+
+        out = self.roundtrip(str(self.directory / "catalog.ndjson"))
+        self.assert_imported()
+        self.assertIn("subscription: загружено 2, добавлено 2, пропущено 0", out)
+        self.assertIn("строк/с", out)
+
+    def test_csv_roundtrip(self):
+        """Тест выгрузки и загрузки CSV-файлов моделей командой COPY."""
+
+        self.roundtrip(str(self.directory / "csv"), "--format", "csv")
+        self.assertEqual(
+            sorted(path.name for path in (self.directory / "csv").iterdir()),
+            ["course.csv", "lesson.csv", "module.csv", "subscription.csv"],
+        )
+        self.assert_imported()
+
+    def test_unresolved_references(self):
+        """Тест загрузки записей со ссылками на отсутствующие объекты."""
+
+        path = self.directory / "catalog.ndjson"
+        records = [
+            {"model": "module", "id": 1, "title": "М", "description": "-"},
+            {
+                "model": "course",
+                "id": 1,
+                "title": "К",
+                "description": "-",
+                "module_id": 2,
+                "owner_email": "unknown@test.ru",
+            },
+            {
+                "model": "subscription",
+                "id": 1,
+                "module_id": 1,
+                "subscriber_email": "unknown@test.ru",
+            },
+            {
+                "model": "subscription",
+                "id": 2,
+                "module_id": 1,
+                "subscriber_email": self.user.email,
+            },
+        ]
+        path.write_text("\n".join(json.dumps(record) for record in records))
+        out = StringIO()
+        call_command("import_catalog", str(path), stdout=out)
+
+        module = Module.objects.get(title="М")
+        self.assertEqual(module.price, 10000)
+        course = Course.objects.get(title="К")
+        self.assertIsNone(course.module_id)
+        self.assertIsNone(course.owner_id)
+        self.assertEqual(
+            list(module.module_for_subscription.values_list("subscriber", flat=True)),
+            [self.user.pk],
+        )
+        self.assertIn(
+            "subscription: загружено 2, добавлено 1, пропущено 1", out.getvalue()
+        )
+
+    def test_invalid_input(self):
+        """Тест отмены всего импорта при ошибке во входных данных."""
+
+        path = self.directory / "catalog.ndjson"
+        path.write_text('{"model": "module", "title": "М", "description": "-"}\n[]\n')
+        with self.assertRaisesMessage(CommandError, "Строка 2"):
+            call_command("import_catalog", str(path), stdout=StringIO())
+        path.write_text('{"model": "module", "id": 1}\n{"model": "module", "id": 1}\n')
+        with self.assertRaisesMessage(CommandError, "повторяющиеся значения id"):
+            call_command("import_catalog", str(path), stdout=StringIO())
+        self.assertEqual(Module.objects.count(), 1)
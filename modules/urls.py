@@ -3,11 +3,15 @@ from rest_framework.routers import DefaultRouter
 
 from modules.apps import ModulesConfig
 from modules.views import (
+    CatalogChangesAPIView,
+    CourseBulkAPIView,
     CourseCreateAPIView,
     CourseDestroyAPIView,
     CourseListAPIView,
     CourseRetrieveAPIView,
+    CourseSubscriberListAPIView,
     CourseUpdateAPIView,
+    LessonBulkAPIView,
     LessonCreateAPIView,
     LessonDestroyAPIView,
     LessonListAPIView,
@@ -26,8 +30,10 @@ router = DefaultRouter()
 router.register(r"modules", ModuleViewSet, basename="modules")
 
 urlpatterns = [
+    path("changes/", CatalogChangesAPIView.as_view(), name="catalog_changes"),
     path("course/", CourseListAPIView.as_view(), name="course_list"),
     path("course/create/", CourseCreateAPIView.as_view(), name="course_create"),
+    path("course/bulk/", CourseBulkAPIView.as_view(), name="course_bulk"),
     path("course/update/<int:pk>", CourseUpdateAPIView.as_view(), name="course_update"),
     path(
         "course/retrieve/<int:pk>",
@@ -37,8 +43,14 @@ urlpatterns = [
     path(
         "course/delete/<int:pk>", CourseDestroyAPIView.as_view(), name="course_delete"
     ),
+    path(
+        "course/<int:pk>/subscribers/",
+        CourseSubscriberListAPIView.as_view(),
+        name="course_subscribers",
+    ),
     path("lesson/", LessonListAPIView.as_view(), name="lesson_list"),
     path("lesson/create/", LessonCreateAPIView.as_view(), name="lesson_create"),
+    path("lesson/bulk/", LessonBulkAPIView.as_view(), name="lesson_bulk"),
     path("lesson/update/<int:pk>", LessonUpdateAPIView.as_view(), name="lesson_update"),
     path(
         "lesson/retrieve/<int:pk>",
@@ -1,33 +1,76 @@
-from rest_framework import generics
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import Http404
+from rest_framework import generics, serializers, status
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
-from modules.models import Course, Lesson, Module, Subscription
-from modules.paginations import CustomPagination
+from modules.mixins import (
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    ModuleTreeMixin,
+)
+from modules.models import (
+    CatalogChange,
+    Course,
+    Lesson,
+    Module,
+    OutboxEvent,
+    Subscription,
+)
+from modules.paginations import (
+    KeysetPagination,
+    OptionalPagination,
+    SwitchablePagination,
+)
+from modules.querysets import (
+    get_course_queryset,
+    get_lesson_queryset,
+    get_module_queryset,
+)
+from modules.renderers import RawJSONRenderer
 from modules.serializers import (
+    BulkListSerializer,
+    CourseChangeSerializer,
     CourseSerializer,
     LessonSerializer,
+    ModuleChangeSerializer,
     ModuleSerializer,
     SubscriptionSerializer,
+    parse_field_params,
+)
+from modules.services import (
+    bulk_create_objects,
+    bulk_update_objects,
+    toggle_module_subscription,
 )
 from users.permissions import IsModerator, IsOwner
+from users.roles import MODERATOR, get_roles
 
-from modules.tasks import send_updates
 
-
-class ModuleViewSet(ModelViewSet):
+class ModuleViewSet(CachedResponseMixin, ModuleTreeMixin, ModelViewSet):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
     permission_classes = [AllowAny]
-    pagination_class = CustomPagination
+    pagination_class = SwitchablePagination
+    renderer_classes = [RawJSONRenderer, BrowsableAPIRenderer]
+    cache_models = (Module, Course, Lesson, Subscription)
+    owner_field = "owner"
+
+    def get_queryset(self):
+        if self.action == "destroy":
+            return super().get_queryset()
+        fields, expand = parse_field_params(self.request)
+        return get_module_queryset(fields, expand)
 
     def perform_create(self, serializer):
-        module = serializer.save()
-        module.owner = self.request.user
-        module.save()
+        serializer.save(owner=self.request.user)
 
     def get_permissions(self):
         if self.action == "create":
@@ -39,29 +82,73 @@ class ModuleViewSet(ModelViewSet):
         return super().get_permissions()
 
     def partial_update(self, request, *args, **kwargs):
-        module_item = get_object_or_404(self.queryset, pk=kwargs.get("pk"))
-        serializer = self.serializer_class(module_item, data=request.data, partial=True)
+        module_item = self.get_object()
+        serializer = self.get_serializer(module_item, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        send_updates.delay(module_item.id)
+        # Событие для рассылки фиксируется вместе с изменением модуля и
+        # публикуется в брокер ретранслятором outbox (задача relay_outbox).
+        # Сводная рассылка читает изменения из журнала каталога.
+        with transaction.atomic():
+            serializer.save()
+            if settings.NOTIFICATION_MODE == "immediate":
+                OutboxEvent.objects.create(
+                    event_type="module_updated", payload={"module_id": module_item.id}
+                )
         return Response(serializer.data)
 
+    @action(
+        detail=True,
+        serializer_class=SubscriptionSerializer,
+        pagination_class=KeysetPagination,
+    )
+    def subscribers(self, request, pk=None):
+        """Подписчики модуля с keyset-пагинацией по id."""
 
-class CourseListAPIView(generics.ListAPIView):
+        get_object_or_404(Module.objects.only("pk"), pk=pk)
+        queryset = Subscription.objects.filter(module_id=pk).order_by("pk")
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class CourseListAPIView(CachedResponseMixin, generics.ListAPIView):
     """Контроллер для списка курсов."""
 
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [AllowAny]
-    pagination_class = CustomPagination
+    pagination_class = SwitchablePagination
+    cache_models = (Course, Lesson, Subscription)
+    owner_field = "owner"
+
+    def get_queryset(self):
+        fields, expand = parse_field_params(self.request)
+        return get_course_queryset(fields, expand).order_by("pk")
 
 
-class CourseRetrieveAPIView(generics.RetrieveAPIView):
+class CourseRetrieveAPIView(CachedResponseMixin, generics.RetrieveAPIView):
     """Контроллер для детального просмотра курса образовательного модуля."""
 
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticated, IsModerator | IsOwner, IsAdminUser]
+    cache_models = (Course, Lesson, Subscription)
+
+    def get_queryset(self):
+        fields, expand = parse_field_params(self.request)
+        return get_course_queryset(fields, expand)
+
+
+class CourseSubscriberListAPIView(generics.ListAPIView):
+    """Контроллер для вывода подписчиков курса с keyset-пагинацией по id."""
+
+    serializer_class = SubscriptionSerializer
+    permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        course = get_object_or_404(Course.objects.only("pk"), pk=self.kwargs["pk"])
+        return Subscription.objects.filter(course_id=course.pk).order_by("pk")
 
 
 class CourseCreateAPIView(generics.CreateAPIView):
@@ -72,6 +159,91 @@ class CourseCreateAPIView(generics.CreateAPIView):
     permission_classes = [IsModerator | IsOwner, IsAdminUser]
 
 
+class BulkAPIView(generics.GenericAPIView):
+    """
+    Массовое создание (POST) и изменение (PATCH) объектов списком.
+    Элементы проверяются сериализатором с many=True и записываются в одной
+    транзакции одним INSERT или UPDATE. Если хотя бы один элемент не прошел
+    проверку, ничего не сохраняется, а ответ 400 содержит список ошибок
+    по элементам в порядке запроса.
+    """
+
+    permission_classes = [IsModerator | IsOwner, IsAdminUser]
+
+    def get_bulk_serializer(self, *args, partial=False, **kwargs):
+        context = self.get_serializer_context()
+        child = self.get_serializer_class()(context=context, partial=partial)
+        return BulkListSerializer(
+            *args,
+            child=child,
+            context=context,
+            partial=partial,
+            max_length=settings.CATALOG_BULK_MAX_ITEMS,
+            **kwargs,
+        )
+
+    def get_editable_objects(self, data):
+        """
+        Загружает одним запросом изменяемые объекты, доступные пользователю:
+        модератору - все, остальным - только собственные (IsOwner).
+        """
+
+        items = data if isinstance(data, list) else []
+        pks = [item.get("id") for item in items if isinstance(item, dict)]
+        queryset = self.queryset.model.objects.filter(
+            pk__in=[pk for pk in pks if isinstance(pk, int)]
+        )
+        if MODERATOR not in get_roles(self.request):
+            queryset = queryset.filter(owner_id=self.request.user.pk)
+        return queryset.in_bulk()
+
+    def get_response(self, objs, status_code):
+        queryset = self.get_queryset().filter(pk__in=[obj.pk for obj in objs])
+        serializer = self.get_serializer(queryset.order_by("pk"), many=True)
+        return Response(serializer.data, status=status_code)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_bulk_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        model = self.queryset.model
+        # Владелец задается сразу при вставке, без повторного сохранения
+        objs = bulk_create_objects(
+            model,
+            [
+                model(**{**attrs, "owner": request.user})
+                for attrs in serializer.validated_data
+            ],
+        )
+        return self.get_response(objs, status.HTTP_201_CREATED)
+
+    def patch(self, request, *args, **kwargs):
+        instances = self.get_editable_objects(request.data)
+        serializer = self.get_bulk_serializer(
+            instances, data=request.data, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        objs = {}
+        fields = set()
+        for item, attrs in zip(request.data, serializer.validated_data):
+            obj = instances[item["id"]]
+            for name, value in attrs.items():
+                setattr(obj, name, value)
+            fields |= attrs.keys()
+            objs[obj.pk] = obj
+        bulk_update_objects(self.queryset.model, list(objs.values()), fields)
+        return self.get_response(objs.values(), status.HTTP_200_OK)
+
+
+class CourseBulkAPIView(BulkAPIView):
+    """Контроллер для массового создания и изменения курсов."""
+
+    queryset = Course.objects.all()
+    serializer_class = CourseSerializer
+
+    def get_queryset(self):
+        return get_course_queryset()
+
+
 class CourseUpdateAPIView(generics.UpdateAPIView):
     """Контроллер для изменения курса образовательного модуля."""
 
@@ -96,26 +268,40 @@ class LessonCreateAPIView(generics.CreateAPIView):
     permission_classes = [IsModerator | IsOwner, IsAdminUser]
 
     def perform_create(self, serializer):
-        lesson = serializer.save()
-        lesson.owner = self.request.user
-        lesson.save()
+        serializer.save(owner=self.request.user)
 
 
-class LessonListAPIView(generics.ListAPIView):
-    """Контроллер для вывода списка уроков курса."""
+class LessonBulkAPIView(BulkAPIView):
+    """Контроллер для массового создания и изменения уроков."""
 
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
-    pagination_class = CustomPagination
+
+
+class LessonListAPIView(CachedResponseMixin, generics.ListAPIView):
+    """Контроллер для вывода списка уроков курса."""
+
+    queryset = Lesson.objects.order_by("pk")
+    serializer_class = LessonSerializer
+    pagination_class = SwitchablePagination
     permission_classes = [AllowAny]
+    cache_models = (Lesson,)
+    cache_per_user = False
+    owner_field = "owner"
+
+    def get_queryset(self):
+        fields, _ = parse_field_params(self.request)
+        return get_lesson_queryset(fields).order_by("pk")
 
 
-class LessonRetrieveAPIView(generics.RetrieveAPIView):
+class LessonRetrieveAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Контроллер для просмотра урока курса."""
 
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated, IsModerator | IsOwner, IsAdminUser]
+    cache_models = (Lesson,)
+    cache_per_user = False
 
 
 class LessonUpdateAPIView(generics.UpdateAPIView):
@@ -137,9 +323,11 @@ class LessonDestroyAPIView(generics.DestroyAPIView):
 class SubscriptionListAPIView(generics.ListAPIView):
     """Контроллер для вывода списка подписок."""
 
-    queryset = Subscription.objects.all()
+    queryset = Subscription.objects.order_by("pk")
     serializer_class = SubscriptionSerializer
     permission_classes = [AllowAny]
+    pagination_class = OptionalPagination
+    owner_field = "subscriber"
 
 
 class SubscriptionCreateAPIView(generics.ListCreateAPIView):
@@ -166,39 +354,21 @@ class SubscriptionCreateAPIView(generics.ListCreateAPIView):
         serializer.save(subscriber=self.request.user)
 
     def post(self, request, *args, **kwargs):
-        user = self.request.user
-        module_id = self.request.data.get("module")
-
-        # Получаем модуль
-        module_item = get_object_or_404(Module, pk=module_id)
-
-        # Инициализируем сообщение
-        message = {}
-
-        # Управление подпиской на модуль
-        subs_module = Subscription.objects.filter(subscriber=user, module=module_item)
-
-        if subs_module.exists():
-            subs_module.delete()
-            message["module"] = "Подписка на модуль удалена"
-        else:
-            Subscription.objects.create(subscriber=user, module=module_item)
-            message["module"] = "Подписка на модуль добавлена"
-
-        # Проверяем наличие связанного курса и управление подпиской на курс
-        if getattr(module_item, "course", None):
-            course_item = module_item.course
-
-            subs_course = Subscription.objects.filter(
-                subscriber=user, course=course_item
-            )
-
-            if subs_course.exists():
-                subs_course.delete()
-                message["course"] = "Подписка на курс удалена"
-            else:
-                Subscription.objects.create(subscriber=user, course=course_item)
-                message["course"] = "Подписка на курс добавлена"
+        try:
+            module_id = Module._meta.pk.to_python(self.request.data.get("module"))
+        except DjangoValidationError:
+            module_id = None
+        result = None
+        if module_id is not None:
+            result = toggle_module_subscription(self.request.user, module_id)
+        if result is None:
+            raise Http404(f"No {Module._meta.object_name} matches the given query.")
+
+        subscribed, courses_count = result
+        action = "добавлена" if subscribed else "удалена"
+        message = {"module": f"Подписка на модуль {action}"}
+        if courses_count:
+            message["course"] = f"Подписка на курсы модуля {action}"
 
         # Возвращаем ответ в API
         return Response({"message": message})
@@ -240,3 +410,96 @@ class SubscriptionDestroyAPIView(generics.DestroyAPIView):
     queryset = Subscription.objects.all()
     serializer_class = SubscriptionSerializer
     permission_classes = [IsModerator | IsAdminUser]
+
+
+class CatalogChangesAPIView(generics.GenericAPIView):
+    """
+    Контроллер ленты изменений каталога для инкрементальной синхронизации.
+
+    Возвращает модули, курсы и уроки, созданные, измененные или удаленные
+    после курсора since. Для каждого объекта выводится только последнее
+    изменение, удаленные объекты выводятся без данных (tombstone). Курсор
+    старше срока хранения журнала отклоняется ответом 410.
+    """
+
+    permission_classes = [AllowAny]
+    default_limit = 100
+    max_limit = 1000
+    change_serializers = {
+        "module": (Module, ModuleChangeSerializer),
+        "course": (Course, CourseChangeSerializer),
+        "lesson": (Lesson, LessonSerializer),
+    }
+
+    def get_int_param(self, name, default, minimum):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            raise serializers.ValidationError({name: "Ожидается целое число."})
+        if value < minimum:
+            raise serializers.ValidationError(
+                {name: f"Ожидается число не меньше {minimum}."}
+            )
+        return value
+
+    def get(self, request, *args, **kwargs):
+        since = self.get_int_param("since", 0, minimum=0)
+        limit = min(
+            self.get_int_param("limit", self.default_limit, minimum=1), self.max_limit
+        )
+
+        # Записи не позже курсора удалены по сроку хранения журнала: изменения
+        # между ним и оставшимися записями потеряны, клиент загружает каталог
+        # заново
+        if since and not CatalogChange.objects.filter(pk__lte=since).exists():
+            return Response(
+                {"since": "История изменений удалена, загрузите каталог заново."},
+                status=status.HTTP_410_GONE,
+            )
+
+        # Только изменения зафиксированных транзакций в порядке фиксации:
+        # изменение, зафиксированное позже, не окажется перед курсором
+        changes = list(CatalogChange.objects.committed().after(since)[: limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        # Для каждого объекта оставляем только последнее изменение
+        latest = {}
+        for change in changes:
+            latest.pop((change.model, change.object_id), None)
+            latest[(change.model, change.object_id)] = change
+
+        objects = {}
+        for name, (model, _) in self.change_serializers.items():
+            pks = [
+                change.object_id
+                for (model_name, _), change in latest.items()
+                if model_name == name and change.action != "deleted"
+            ]
+            if pks:
+                objects[name] = model.objects.in_bulk(pks)
+
+        results = []
+        for (name, object_id), change in latest.items():
+            obj = objects.get(name, {}).get(object_id)
+            data = None
+            if obj is not None:
+                serializer_class = self.change_serializers[name][1]
+                data = serializer_class(obj, context={"request": request}).data
+            results.append(
+                {
+                    "seq": change.pk,
+                    "model": name,
+                    "id": object_id,
+                    "action": change.action,
+                    "data": data,
+                }
+            )
+
+        return Response(
+            {
+                "cursor": changes[-1].pk if changes else since,
+                "has_more": has_more,
+                "changes": results,
+            }
+        )
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.crypto import salted_hmac
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import User
+from users.roles import load_roles
+
+# Состояние пользователя для проверки токенов в общем кэше
+AUTH_STATE_KEY = "users:auth:{}"
+# Claim с версией токена
+VERSION_CLAIM = "ver"
+# Поля пользователя, которые передаются в claims токена
+USER_CLAIMS = ("email", "is_staff", "is_superuser")
+
+
+def get_token_version(user, roles):
+    """
+    Возвращает версию токенов пользователя. Версия меняется при смене
+    пароля, почты, прав администратора или ролей, и выданные ранее
+    токены перестают приниматься.
+    """
+
+    value = "|".join(
+        [user.password, *(str(getattr(user, name)) for name in USER_CLAIMS)]
+        + sorted(roles)
+    )
+    return salted_hmac("users.token_version", value).hexdigest()[:16]
+
+
+def get_auth_state(user_id):
+    """
+    Возвращает признак активности и версию токенов пользователя
+    из кэша или из базы либо None, если пользователя нет.
+    """
+
+    key = AUTH_STATE_KEY.format(user_id)
+    state = cache.get(key)
+    if state is None:
+        user = (
+            User.objects.filter(pk=user_id)
+            .only("password", "is_active", *USER_CLAIMS)
+            .first()
+        )
+        if user is None:
+            return None
+        state = {
+            "is_active": user.is_active,
+            "version": get_token_version(user, load_roles(user)),
+        }
+        cache.set(key, state, timeout=settings.USER_AUTH_CACHE_TIMEOUT)
+    return state
+
+
+def invalidate_auth_state(user_ids):
+    """Удаляет состояние пользователей из общего кэша."""
+
+    keys = [AUTH_STATE_KEY.format(pk) for pk in user_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Аутентификация по JWT без запроса пользователя из базы.
+
+    Пользователь строится из claims токена (id, почта, права администратора),
+    остальные поля загружаются только при обращении к ним. Активность
+    пользователя и версия токена сверяются с состоянием, закэшированным на
+    USER_AUTH_CACHE_TIMEOUT секунд. Токены без версии, выданные до ее
+    появления, проверяются обычным запросом к базе.
+    """
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        state = get_auth_state(user_id)
+        if state is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not state["is_active"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if validated_token[VERSION_CLAIM] != state["version"]:
+            raise AuthenticationFailed(
+                "Токен отозван: данные пользователя изменились.",
+                code="token_revoked",
+            )
+
+        values = {name: validated_token.get(name) for name in USER_CLAIMS}
+        values.update(id=user_id, is_active=True)
+        # from_db ожидает значения в порядке полей модели
+        names = [
+            field.attname
+            for field in User._meta.concrete_fields
+            if field.attname in values
+        ]
+        return User.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
@@ -0,0 +1,54 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+# Параметр запроса: id владельца или "me" - текущий пользователь
+OWNER_PARAM = "owner"
+OWNER_ME = "me"
+
+
+def is_owner_filtered_by_me(request):
+    """Проверяет, запрошены ли объекты текущего пользователя (?owner=me)."""
+
+    return request.query_params.get(OWNER_PARAM) == OWNER_ME
+
+
+class OwnerFilterBackend(BaseFilterBackend):
+    """
+    Ограничивает выборку объектами владельца условием WHERE owner_id = %s
+    (правило IsOwner на уровне запроса): ?owner=me - объекты текущего
+    пользователя, ?owner=<id> - объекты указанного пользователя.
+
+    Поле владельца задается атрибутом owner_field представления;
+    представления без него не фильтруются.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        owner_field = getattr(view, "owner_field", None)
+        value = request.query_params.get(OWNER_PARAM)
+        if owner_field is None or value is None:
+            return queryset
+        if value == OWNER_ME:
+            if not request.user.is_authenticated:
+                return queryset.none()
+            owner_id = request.user.pk
+        else:
+            try:
+                owner_id = int(value)
+            except ValueError:
+                raise ValidationError(
+                    {OWNER_PARAM: "Ожидается id пользователя или me."}
+                )
+        return queryset.filter(**{f"{owner_field}_id": owner_id})
+
+    def get_schema_operation_parameters(self, view):
+        if getattr(view, "owner_field", None) is None:
+            return []
+        return [
+            {
+                "name": OWNER_PARAM,
+                "required": False,
+                "in": "query",
+                "description": "id владельца или me - объекты текущего пользователя",
+                "schema": {"type": "string"},
+            }
+        ]
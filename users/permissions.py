@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from users.roles import MODERATOR, get_roles
+
 
 class IsModerator(permissions.BasePermission):
     """Проверяет, является ли пользователь модератором."""
@@ -7,13 +9,12 @@ class IsModerator(permissions.BasePermission):
     message = "Вы не являетесь модератором"
 
     def has_permission(self, request, view):
-        return request.user.groups.filter(name="moderator").exists()
+        return MODERATOR in get_roles(request)
 
 
 class IsOwner(permissions.BasePermission):
     """Проверяет, является ли пользователь владельцем."""
 
     def has_object_permission(self, request, view, obj):
-        if obj.owner == request.user:
-            return True
-        return False
+        # Сравнение id не загружает владельца из базы
+        return request.user.is_authenticated and obj.owner_id == request.user.pk
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Роли (группы) пользователя в общем кэше
+ROLES_KEY = "users:roles:{}"
+# Claim access-токена с ролями пользователя (USER_ROLES_IN_TOKEN)
+ROLES_CLAIM = "roles"
+MODERATOR = "moderator"
+
+
+def load_roles(user):
+    """Возвращает названия групп пользователя из кэша или из базы."""
+
+    key = ROLES_KEY.format(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = sorted(user.groups.values_list("name", flat=True))
+        cache.set(key, roles, timeout=settings.USER_ROLES_TIMEOUT)
+    return frozenset(roles)
+
+
+def get_roles(request):
+    """
+    Возвращает роли пользователя запроса. Роли берутся из claim
+    access-токена, если он есть, иначе из общего кэша или базы; результат
+    запоминается в запросе.
+    """
+
+    roles = getattr(request, "user_roles", None)
+    if roles is None:
+        user = request.user
+        token = request.auth
+        claim = token.get(ROLES_CLAIM) if hasattr(token, "get") else None
+        if not user.is_authenticated:
+            roles = frozenset()
+        elif claim is not None:
+            roles = frozenset(claim)
+        else:
+            roles = load_roles(user)
+        request.user_roles = roles
+    return roles
+
+
+def invalidate_roles(user_ids):
+    """Удаляет роли пользователей из общего кэша."""
+
+    keys = [ROLES_KEY.format(pk) for pk in user_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # Повторное удаление после фиксации транзакции не дает параллельному
+    # запросу закэшировать роли, прочитанные до коммита.
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,9 +1,32 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from users.authentication import USER_CLAIMS, VERSION_CLAIM, get_token_version
 from users.models import User
+from users.roles import ROLES_CLAIM, load_roles
 
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = "__all__"
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Добавляет в токены claims пользователя (почта, права администратора,
+    роли) и версию токена, чтобы аутентификация и проверка прав
+    не обращались к базе.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        roles = load_roles(user)
+        for name in USER_CLAIMS:
+            token[name] = getattr(user, name)
+        token[VERSION_CLAIM] = get_token_version(user, roles)
+        if settings.USER_ROLES_IN_TOKEN:
+            token[ROLES_CLAIM] = sorted(roles)
+        return token
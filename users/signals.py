@@ -0,0 +1,58 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.authentication import invalidate_auth_state
+from users.models import User
+from users.roles import invalidate_roles
+
+
+def invalidate_users(user_ids):
+    """Сбрасывает кэш ролей и состояние токенов пользователей."""
+
+    user_ids = list(user_ids)
+    invalidate_roles(user_ids)
+    invalidate_auth_state(user_ids)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_changed_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Сбрасывает кэш ролей и версию токенов при изменении
+    состава групп пользователя.
+    """
+
+    if action == "pre_clear" and reverse:
+        # После очистки группы ее участников уже не выбрать
+        instance._cleared_user_ids = list(
+            instance.user_set.values_list("pk", flat=True)
+        )
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        invalidate_users([instance.pk])
+    elif action == "post_clear":
+        invalidate_users(getattr(instance, "_cleared_user_ids", []))
+    else:
+        invalidate_users(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_roles(sender, instance, **kwargs):
+    """Сбрасывает кэш ролей участников переименованной или удаленной группы."""
+
+    if kwargs.get("created"):
+        return
+    invalidate_users(instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_state(sender, instance, **kwargs):
+    """
+    Сбрасывает состояние токенов пользователя: смена пароля, почты
+    или прав меняет версию токенов, блокировка запрещает вход.
+    """
+
+    invalidate_auth_state([instance.pk])
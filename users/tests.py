@@ -0,0 +1,159 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from modules.models import Module, Subscription
+from users.models import User
+from users.permissions import IsOwner
+from users.roles import ROLES_KEY
+
+
+class RoleCacheTestCase(APITestCase):
+    """Тесты кэширования ролей пользователя для проверки прав."""
+
+    def setUp(self):
+        cache.clear()
+        self.moderators = Group.objects.create(name="moderator")
+        self.user = User.objects.create(email="roles@test.ru")
+        self.user.set_password("1234")
+        self.user.save()
+        self.module = Module.objects.create(title="Модуль", description="-")
+        self.subscription = Subscription.objects.create(
+            subscriber=self.user, module=self.module
+        )
+
+    def get_subscription(self):
+        # Доступно только модераторам и администраторам
+        return self.client.get(f"/subscription/retrieve/{self.subscription.pk}")
+
+    def count_group_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_subscription()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sum("auth_group" in query["sql"] for query in queries)
+
+    def test_roles_cached_across_requests(self):
+        """Тест одного запроса групп на несколько запросов пользователя."""
+
+        self.user.groups.add(self.moderators)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.count_group_queries(), 1)
+        self.assertEqual(cache.get(ROLES_KEY.format(self.user.pk)), ["moderator"])
+        self.assertEqual(self.count_group_queries(), 0)
+
+    def test_roles_invalidated_on_group_change(self):
+        """Тест сброса кэша ролей при изменении групп пользователя."""
+
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.get_subscription().status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.groups.add(self.moderators)
+        self.assertEqual(self.get_subscription().status_code, status.HTTP_200_OK)
+
+        self.moderators.user_set.clear()
+        self.assertEqual(self.get_subscription().status_code, status.HTTP_403_FORBIDDEN)
+
+        self.moderators.user_set.add(self.user)
+        self.assertEqual(self.get_subscription().status_code, status.HTTP_200_OK)
+
+        self.moderators.delete()
+        self.assertEqual(self.get_subscription().status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_owner_checked_by_id(self):
+        """Тест проверки владельца без загрузки пользователя."""
+
+        self.module.owner = self.user
+        self.module.save()
+        module = Module.objects.only("pk", "owner").get(pk=self.module.pk)
+        request = SimpleNamespace(user=self.user)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsOwner().has_object_permission(request, None, module))
+
+    @override_settings(USER_ROLES_IN_TOKEN=True)
+    def test_roles_claim_in_token(self):
+        """Тест проверки прав по claim токена без запросов групп."""
+
+        self.user.groups.add(self.moderators)
+        response = self.client.post(
+            "/users/login/", {"email": "roles@test.ru", "password": "1234"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        access = response.json()["access"]
+        self.assertEqual(AccessToken(access)["roles"], ["moderator"])
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.get_subscription()
+        cache.delete(ROLES_KEY.format(self.user.pk))
+        self.assertEqual(self.count_group_queries(), 0)
+        self.assertIsNone(cache.get(ROLES_KEY.format(self.user.pk)))
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    """Тесты аутентификации по JWT без запроса пользователя из базы."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="jwt@test.ru", is_staff=True)
+        self.user.set_password("1234")
+        self.user.save()
+        self.module = Module.objects.create(
+            title="Модуль", description="-", owner=self.user
+        )
+        response = self.client.post(
+            "/users/login/", {"email": "jwt@test.ru", "password": "1234"}
+        )
+        self.access = response.json()["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def get_module(self):
+        return self.client.get(f"/modules/{self.module.pk}/")
+
+    def test_user_from_claims(self):
+        """Тест аутентификации без запроса к таблице пользователей."""
+
+        self.assertEqual(self.get_module().status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_module()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            any('"users_user"' in query["sql"] for query in queries),
+            [query["sql"] for query in queries],
+        )
+
+    def test_token_revoked_on_password_change(self):
+        """Тест отзыва токенов после смены пароля."""
+
+        self.assertEqual(self.get_module().status_code, status.HTTP_200_OK)
+        self.user.set_password("5678")
+        self.user.save()
+        self.assertEqual(self.get_module().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_revoked_on_role_change(self):
+        """Тест отзыва токенов после изменения ролей пользователя."""
+
+        self.assertEqual(self.get_module().status_code, status.HTTP_200_OK)
+        self.user.groups.add(Group.objects.create(name="moderator"))
+        self.assertEqual(self.get_module().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user(self):
+        """Тест запрета доступа заблокированному пользователю."""
+
+        self.assertEqual(self.get_module().status_code, status.HTTP_200_OK)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # Без сигналов состояние обновится по истечении времени жизни кэша
+        cache.clear()
+        self.assertEqual(self.get_module().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_without_version(self):
+        """Тест токенов без версии, выданных до ее появления."""
+
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(self.get_module().status_code, status.HTTP_200_OK)